@@ -0,0 +1,73 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.urls import path
+
+from api.views import IngredientViewSet, MeViewSet, RecipeViewSet, TagViewSet
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}
+
+
+def serve(sync_view, request, *args, **kwargs):
+    """Запрос к вьюсету целиком, вместе с рендерингом ответа."""
+    # у потока пула своё соединение с БД, сигналы request_started и
+    # request_finished закрывают соединения только основного потока
+    close_old_connections()
+    try:
+        response = sync_view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            metrics = getattr(request, 'metrics', None)
+            if metrics is not None:
+                metrics.finish_view()
+            # иначе обработчик отрендерит ответ отдельным заходом
+            # в общий поток
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(sync_view):
+    """
+    Вьюсет под ASGI в пуле потоков, а не в общем потоке.
+
+    Синхронные вьюхи Django под ASGI выполняет по очереди в одном
+    потоке. Здесь каждый запрос - один заход в пул: аутентификация,
+    права, фильтры, пагинация и кэш ответов те же, что у вьюсета.
+    """
+
+    @wraps(sync_view)
+    async def view(request, *args, **kwargs):
+        return await sync_to_async(serve, thread_sensitive=False)(
+            sync_view, request, *args, **kwargs
+        )
+
+    return view
+
+
+urlpatterns = [
+    path('recipes/', async_view(RecipeViewSet.as_view(LIST_ACTIONS))),
+    path(
+        'recipes/<int:pk>/',
+        async_view(RecipeViewSet.as_view(DETAIL_ACTIONS)),
+    ),
+    path('tags/', async_view(TagViewSet.as_view({'get': 'list'}))),
+    path(
+        'tags/<int:pk>/', async_view(TagViewSet.as_view({'get': 'retrieve'}))
+    ),
+    path(
+        'ingredients/', async_view(IngredientViewSet.as_view(LIST_ACTIONS))
+    ),
+    path(
+        'ingredients/<int:pk>/',
+        async_view(IngredientViewSet.as_view(DETAIL_ACTIONS)),
+    ),
+    path('users/me/', async_view(MeViewSet.as_view({'get': 'list'}))),
+]
@@ -0,0 +1,107 @@
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.authentication import TokenAuthentication
+
+from api.middleware import current_metrics
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def token_cache_key(key):
+    return f'auth-user:{key}'
+
+
+def cached_user_fields(user):
+    """Поля пользователя для кэша токенов: всё, кроме пароля."""
+    return {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields
+        if field.attname != 'password'
+    }
+
+
+def forget_tokens(keys):
+    """Убирает токены из кэша после коммита текущей транзакции."""
+    # до коммита соседний запрос может снова положить в кэш
+    # токен, прочитанный из БД
+    cache_keys = [token_cache_key(key) for key in keys]
+    transaction.on_commit(lambda: caches['auth'].delete_many(cache_keys))
+
+
+class HitRatio:
+    """Попадания в кэш токенов в этом процессе."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @property
+    def ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            total = self.hits + self.misses
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.auth_cache = 'hit' if hit else 'miss'
+        if total % settings.AUTH_CACHE_LOG_EVERY == 0:
+            logger.info(json.dumps({
+                'event': 'auth_cache',
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.ratio, 4),
+            }))
+
+
+auth_cache_stats = HitRatio()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к БД на каждый вызов.
+
+    По ключу токена в кэше auth (LRU с ограничением числа записей
+    и TTL) лежат дата токена и поля пользователя без хеша пароля.
+    Выход, сохранение пользователя и удаление токена стирают запись
+    сразу, см. api.signals.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = caches['auth']
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        auth_cache_stats.record(cached is not None)
+        if cached is not None:
+            return self.from_cache(key, *cached)
+
+        # неверный и неактивный токен не кэшируем: тут же исключение
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, (token.created, cached_user_fields(user)))
+        return user, token
+
+    def from_cache(self, key, created, fields):
+        # пароль остаётся отложенным полем и читается из БД, только
+        # если его проверяют, например при смене пароля
+        user = User.from_db(
+            DEFAULT_DB_ALIAS, list(fields), list(fields.values())
+        )
+        token = self.get_model().from_db(
+            DEFAULT_DB_ALIAS,
+            ['key', 'user_id', 'created'],
+            [key, user.pk, created],
+        )
+        token.user = user
+        return user, token
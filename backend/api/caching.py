@@ -0,0 +1,125 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import quote_etag
+
+from api.replicas import fresh_reads
+from recipes.relations import RELATIONS, get_relation_version
+from recipes.versions import get_table_versions
+
+
+def response_validators(cache_models, path, format, user_id):
+    """
+    ETag по версиям таблиц и связей пользователя и время изменения.
+
+    Время - секунды последней версии, для fresh_reads. В Last-Modified
+    оно не уходит: с точностью до секунды запись в ту же секунду
+    отдала бы на If-Modified-Since устаревший 304. ETag строится по
+    версиям в миллисекундах и этого не пропускает.
+    """
+    versions = get_table_versions(cache_models)
+    parts = [path, format]
+    if user_id is not None:
+        # is_favorited и т.п. у каждого пользователя свои
+        versions += [
+            get_relation_version(relation, user_id) for relation in RELATIONS
+        ]
+        parts.append(user_id)
+    parts += versions
+    etag = hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return quote_etag(etag), max(versions) // 1000
+
+
+def cached_response_key(etag):
+    return f'response:{etag}'
+
+
+def get_cached_response(etag):
+    """Готовый анонимный ответ из кэша или None."""
+    cached = cache.get(cached_response_key(etag))
+    if cached is None:
+        return None
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def cache_response(etag, response):
+    cache.set(
+        cached_response_key(etag),
+        (response.content, response['Content-Type']),
+        settings.API_CACHE_MAX_AGE,
+    )
+
+
+def patch_cache_headers(response, etag, anonymous):
+    response['ETag'] = etag
+    if anonymous:
+        patch_cache_control(
+            response, public=True, max_age=settings.API_CACHE_MAX_AGE
+        )
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Accept', 'Authorization'))
+
+
+def cached_read(handler):
+    """
+    Условный GET для метода вьюсета.
+
+    Отдаёт 304, если клиент прислал актуальный ETag,
+    анонимам отдаёт готовый ответ из кэша. Список таблиц, от которых
+    зависит ответ, задаётся атрибутом cache_models вьюсета. Сразу
+    после изменения ответ собирается с основной базы.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        etag, changed_at = response_validators(
+            self.cache_models,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            request.user.pk,
+        )
+        anonymous = not request.user.is_authenticated
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None and anonymous:
+            response = get_cached_response(etag)
+        if response is None:
+            with fresh_reads(changed_at):
+                response = handler(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if anonymous:
+                response.add_post_render_callback(
+                    lambda rendered: cache_response(etag, rendered)
+                )
+
+        patch_cache_headers(response, etag, anonymous)
+        return response
+
+    return wrapper
+
+
+class CachedReadMixin:
+    """Условные GET и кэш ответов для list и retrieve."""
+
+    cache_models = ()
+
+    @cached_read
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_read
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
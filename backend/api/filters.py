@@ -1,27 +1,84 @@
+from django.db.models import Count, Exists, OuterRef
 from django_filters import rest_framework as filters
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Ingredient
+from recipes.models import Recipe, RecipeTag
+from recipes.search import search_recipes
+
+
+TAGS_MODE_ALL = 'all'
+ORDERING_POPULAR = 'popular'
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.CharFilter(field_name='tags__slug')
+    """
+    Фильтр рецептов.
+
+    ?tags= можно повторять: по умолчанию подходят рецепты с любым
+    из тегов, с ?tags_mode=all - только со всеми сразу. Неизвестный
+    тег не ошибка: с ним просто ничего не находится.
+    ?ordering=popular сортирует по рейтингу популярности, страницу
+    по нему выбирает RecipeViewSet.paginate_queryset.
+    """
+
+    search = filters.CharFilter(method='filter_search')
+    tags = filters.CharFilter(method='filter_tags')
     is_favorited = filters.BooleanFilter(
         field_name='is_favorited'
     )
     is_in_shopping_cart = filters.BooleanFilter(
         field_name='is_in_shopping_cart'
     )
+    # последним: перекрывает порядок по релевантности из search
+    ordering = filters.ChoiceFilter(
+        choices=((ORDERING_POPULAR, 'По популярности'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         fields = ('tags',)
         model = Recipe
 
+    def filter_tags(self, queryset, name, value):
+        # CharFilter видит только последний ?tags=, берём все
+        slugs = [slug for slug in self.data.getlist(name) if slug]
+        if not slugs:
+            return queryset
+        # EXISTS вместо JOIN: рецепты не дублируются и не нужен DISTINCT
+        if self.data.get('tags_mode') == TAGS_MODE_ALL:
+            for slug in slugs:
+                queryset = queryset.filter(
+                    Exists(
+                        RecipeTag.objects.filter(
+                            recipe=OuterRef('pk'), tag__slug=slug
+                        )
+                    )
+                )
+            return queryset
+        return queryset.filter(
+            Exists(
+                RecipeTag.objects.filter(
+                    recipe=OuterRef('pk'), tag__slug__in=slugs
+                )
+            )
+        )
 
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
+    def filter_search(self, queryset, name, value):
+        # по названию, тексту и ингредиентам, самые релевантные первыми
+        return search_recipes(queryset, value)
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def filter_ordering(self, queryset, name, value):
+        # сортировать здесь значило бы JOIN и сортировку всех рецептов
+        return queryset
 
+
+def tag_facets(params, queryset, request):
+    """Число рецептов по тегам при текущих фильтрах, кроме тегов."""
+    params = params.copy()
+    params.pop('tags', None)
+    recipes = RecipeFilter(params, queryset=queryset, request=request).qs
+    return dict(
+        RecipeTag.objects.filter(recipe__in=recipes.order_by().values('pk'))
+        .values_list('tag__slug')
+        .annotate(total=Count('recipe', distinct=True))
+        .order_by()
+    )
@@ -0,0 +1,237 @@
+import json
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Subscription, User
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, rank):
+    """Ближайшее значение ранга, values отсортированы."""
+    index = max(0, -(-len(values) * rank // 100) - 1)
+    return values[index]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет маршруты API через тестовый клиент Django и пишет '
+        'перцентили задержки и число SQL-запросов в JSON. Изменения '
+        'в базе откатываются. Данные готовит generate_dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--output',
+            default='benchmark.json',
+            help='Куда записать отчёт.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Отчёт прошлого прогона: вывести разницу с ним.',
+        )
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError(
+                'В базе нет рецептов, сначала запустите generate_dataset.'
+            )
+        self.repeat = options['repeat']
+        self.warmup = options['warmup']
+
+        # тестовый клиент ходит на testserver
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=hosts), transaction.atomic():
+            report = {
+                'commit': git_commit(),
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'repeat': self.repeat,
+                'dataset': {
+                    model._meta.model_name: model.objects.count()
+                    for model in (
+                        User, Recipe, Ingredient, Tag,
+                        Favorite, ShoppingCart, Subscription,
+                    )
+                },
+                'endpoints': self.run_scenarios(),
+            }
+            transaction.set_rollback(True)
+
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report, options['compare'])
+
+    def pick_user(self):
+        """Самый активный покупатель: у него тяжелее всего ответы."""
+        busiest = (
+            ShoppingCart.objects.values('client')
+            .annotate(total=Count('id'))
+            .order_by('-total')
+            .first()
+        )
+        if busiest is not None:
+            return User.objects.get(pk=busiest['client'])
+        return User.objects.order_by('id').first()
+
+    def scenarios(self, user):
+        """(название, метод, путь, тело); пары post/delete - переключатели."""
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        not_favorited = Recipe.objects.exclude(favorites__follower=user)
+        not_in_cart = Recipe.objects.exclude(in_shopping_list__client=user)
+        not_followed = User.objects.exclude(pk=user.pk).exclude(
+            in_subscriptions__follower=user
+        )
+        favorite = not_favorited.order_by('-favorites_count', 'id').first()
+        cart = not_in_cart.order_by('-in_carts_count', 'id').first()
+        author = not_followed.order_by('-followers_count', 'id').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredient = Ingredient.objects.order_by('id').first()
+
+        recipe_body = {
+            'ingredients': [{'id': ingredient.id, 'amount': 10}],
+            'tags': list(Tag.objects.values_list('id', flat=True)[:1]),
+            'name': 'Замер',
+            'text': 'Рецепт для замера.',
+            'cooking_time': 10,
+        }
+        scenarios = [
+            ('tags-list', 'get', '/api/tags/', None),
+            ('ingredients-search', 'get', '/api/ingredients/?name=мо', None),
+            ('recipes-list', 'get', '/api/recipes/', None),
+            (
+                'recipes-list-filtered',
+                'get',
+                '/api/recipes/?is_favorited=1&'
+                + '&'.join(f'tags={slug}' for slug in tags),
+                None,
+            ),
+            ('recipes-list-cursor', 'get', '/api/recipes/?cursor=', None),
+            ('recipes-detail', 'get', f'/api/recipes/{recipe.id}/', None),
+            ('recipes-create', 'post', '/api/recipes/', recipe_body),
+            ('users-me', 'get', '/api/users/me/', None),
+            ('users-list', 'get', '/api/users/', None),
+            (
+                'subscriptions-list',
+                'get',
+                '/api/users/subscriptions/?recipes_limit=3',
+                None,
+            ),
+            (
+                'download-shopping-cart',
+                'get',
+                '/api/recipes/download_shopping_cart/',
+                None,
+            ),
+        ]
+        toggles = (
+            ('favorite', f'/api/recipes/{favorite.id}/favorite/'),
+            ('shopping-cart', f'/api/recipes/{cart.id}/shopping_cart/'),
+            ('subscribe', f'/api/users/{author.id}/subscribe/'),
+        )
+        for name, path in toggles:
+            scenarios += [
+                (f'{name}-add', 'post', path, None),
+                (f'{name}-remove', 'delete', path, None),
+            ]
+        return scenarios
+
+    def request(self, client, method, path, body):
+        if body is None:
+            response = getattr(client, method)(path)
+        else:
+            response = getattr(client, method)(path, body, format='json')
+        if response.streaming:
+            # StreamingHttpResponse строится при чтении
+            b''.join(response.streaming_content)
+        return response
+
+    def run_scenarios(self):
+        user = self.pick_user()
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        scenarios = self.scenarios(user)
+        timings = {name: [] for name, _, _, _ in scenarios}
+        queries = {name: [] for name, _, _, _ in scenarios}
+        statuses = {}
+        # переключатели идут парами, поэтому прогоняем весь набор подряд
+        for iteration in range(self.warmup + self.repeat):
+            for name, method, path, body in scenarios:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = self.request(client, method, path, body)
+                    elapsed = time.perf_counter() - started
+                statuses[name] = response.status_code
+                if iteration >= self.warmup:
+                    timings[name].append(elapsed * 1000)
+                    queries[name].append(len(captured))
+
+        endpoints = {}
+        for name, method, path, _ in scenarios:
+            values = sorted(timings[name])
+            endpoints[name] = {
+                'method': method.upper(),
+                'path': path,
+                'status': statuses[name],
+                **{
+                    f'p{rank}_ms': round(percentile(values, rank), 2)
+                    for rank in PERCENTILES
+                },
+                'max_ms': round(values[-1], 2),
+                'queries': max(queries[name]),
+            }
+        return endpoints
+
+    def print_report(self, report, compare):
+        previous = {}
+        if compare:
+            with open(compare, encoding='utf-8') as file:
+                previous = json.load(file)['endpoints']
+        for name, result in report['endpoints'].items():
+            line = (
+                f'{name:<24} {result["status"]:>3} '
+                f'p50 {result["p50_ms"]:8.2f} ms  '
+                f'p99 {result["p99_ms"]:8.2f} ms  '
+                f'queries {result["queries"]:>3}'
+            )
+            old = previous.get(name)
+            if old:
+                change = (result['p50_ms'] / old['p50_ms'] - 1) * 100
+                line += (
+                    f'  p50 {change:+6.1f}%'
+                    f'  queries {result["queries"] - old["queries"]:+d}'
+                )
+            self.stdout.write(line)
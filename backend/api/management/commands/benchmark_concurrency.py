@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.benchmark_api import percentile
+from recipes.models import Recipe, Tag
+from users.models import User
+
+PERCENTILES = (50, 90, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        'Параллельные запросы на чтение через WSGI-обработчик в потоках '
+        'или через ASGI-обработчик в одном цикле событий. Режим берётся '
+        'из ASYNC_READS: сравните прогоны с ASYNC_READS=0 и 1.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument(
+            '--db-latency',
+            type=float,
+            default=0,
+            help=(
+                'Задержка каждого SQL-запроса в мс: так локальная база '
+                'ведёт себя как сервер в сети.'
+            ),
+        )
+        parser.add_argument('--output', help='Куда записать отчёт JSON.')
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        user = User.objects.order_by('id').first()
+        if recipe is None or tag is None:
+            raise CommandError(
+                'В базе нет рецептов, сначала запустите generate_dataset.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        self.authorization = f'Token {token.key}'
+        self.paths = [
+            '/api/recipes/',
+            f'/api/recipes/?tags={tag.slug}',
+            f'/api/recipes/{recipe.id}/',
+            '/api/tags/',
+            '/api/ingredients/?name=а',
+            '/api/users/me/',
+        ]
+        self.install_latency(options['db_latency'] / 1000)
+
+        mode = 'asgi' if settings.ASYNC_READS else 'wsgi'
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=hosts):
+            if mode == 'asgi':
+                run = asyncio.run(self.run_asgi(options))
+            else:
+                run = self.run_wsgi(options)
+        elapsed, timings, statuses = run
+
+        timings.sort()
+        report = {
+            'mode': mode,
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'db_latency_ms': options['db_latency'],
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(options['requests'] / elapsed, 1),
+            **{
+                f'p{rank}_ms': round(percentile(timings, rank), 2)
+                for rank in PERCENTILES
+            },
+            'statuses': statuses,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def install_latency(self, latency):
+        if not latency:
+            return
+
+        def delay(execute, sql, params, many, context):
+            # sleep отпускает GIL, как ожидание ответа от сервера БД
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install(connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        connection_created.connect(install, weak=False)
+        for connection in connections.all():
+            install(connection)
+
+    def path(self, number):
+        return self.paths[number % len(self.paths)]
+
+    def run_wsgi(self, options):
+        """Как gunicorn с потоками: запрос занимает поток целиком."""
+
+        def fetch(number):
+            started = time.perf_counter()
+            response = Client().get(
+                self.path(number), HTTP_AUTHORIZATION=self.authorization
+            )
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(fetch, range(options['requests'])))
+        return self.collect(time.perf_counter() - started, results)
+
+    async def run_asgi(self, options):
+        """Как uvicorn: один цикл событий, запросы к БД - в пуле потоков."""
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def fetch(number):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(
+                    self.path(number), AUTHORIZATION=self.authorization
+                )
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(fetch(number) for number in range(options['requests']))
+        )
+        return self.collect(time.perf_counter() - started, results)
+
+    def collect(self, elapsed, results):
+        timings = [duration * 1000 for duration, _ in results]
+        statuses = {}
+        for _, status in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        return elapsed, timings, statuses
@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import PageLimitPagination, RecipeCursorPagination
+from recipes.loaders import explicit_dates
+from recipes.models import Recipe
+from users.models import User
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает страницы по номеру (OFFSET + COUNT) и по курсору '
+        'на первой, средней и последней странице ленты рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000000,
+            help='Сколько рецептов должно быть в базе.',
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Не откатывать созданные для замера рецепты.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.fill(options['recipes'])
+            total = Recipe.objects.count()
+            last_page = max((total - 1) // options['limit'], 0)
+            for depth in (0, last_page // 2, last_page):
+                self.measure(depth, options['limit'], options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def fill(self, target):
+        missing = target - Recipe.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(
+            email='benchmark@foodgram.local',
+            defaults={'username': 'benchmark'},
+        )
+        self.stdout.write(f'Создаю {missing} рецептов...')
+        start = timezone.now() - timedelta(seconds=missing)
+        with explicit_dates(Recipe, 'pub_date'):
+            for offset in range(0, missing, BATCH_SIZE):
+                Recipe.objects.bulk_create(
+                    Recipe(
+                        author=author,
+                        name=f'Рецепт {number}',
+                        text='',
+                        cooking_time=1,
+                        pub_date=start + timedelta(seconds=number),
+                    )
+                    for number in range(
+                        offset, min(offset + BATCH_SIZE, missing)
+                    )
+                )
+
+    def measure(self, depth, limit, repeat):
+        # build_absolute_uri проверяет хост по ALLOWED_HOSTS
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        queryset = Recipe.objects.add_user_annotations(None)
+
+        offset_request = Request(
+            factory.get('/', {'page': depth + 1, 'limit': limit})
+        )
+        self.report(
+            'offset', depth, repeat,
+            lambda: list(
+                PageLimitPagination().paginate_queryset(
+                    queryset, offset_request
+                )
+            ),
+        )
+
+        cursor_pagination = RecipeCursorPagination()
+        cursor_request = Request(factory.get('/', {'limit': limit}))
+        if depth:
+            # курсор на нужную страницу получаем вне замера
+            key = (
+                queryset.order_by(*cursor_pagination.ordering)
+                .values_list('pub_date', 'id')[depth * limit - 1]
+            )
+            cursor_pagination.base_url = 'http://localhost/'
+            url = cursor_pagination.encode_key(key, reverse=False)
+            cursor_request = Request(factory.get(url))
+        self.report(
+            'cursor', depth, repeat,
+            lambda: list(
+                RecipeCursorPagination().paginate_queryset(
+                    queryset, cursor_request
+                )
+            ),
+        )
+
+    def report(self, mode, depth, repeat, fetch_page):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                fetch_page()
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        self.stdout.write(
+            f'{mode:<7} page {depth + 1:>8}: '
+            f'median {timings[len(timings) // 2] * 1000:8.2f} ms, '
+            f'queries {len(queries)}'
+        )
@@ -0,0 +1,102 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.management.commands.benchmark_api import percentile
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.serializers import RecipeListSerializer
+from recipes.models import Recipe
+
+RENDERERS = (
+    ('json', JSONRenderer),
+    ('orjson', ORJSONRenderer),
+    ('msgpack', MessagePackRenderer),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Время и пиковая память рендеринга страницы RecipeListSerializer '
+        'стандартным JSONRenderer, orjson и MessagePack. Заодно проверяет, '
+        'что orjson выдаёт те же байты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-sizes',
+            type=int,
+            nargs='+',
+            default=[10, 50, 100, 500],
+        )
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--output', help='Куда записать отчёт JSON.')
+
+    def handle(self, *args, **options):
+        largest = max(options['page_sizes'])
+        recipes = list(
+            Recipe.objects.add_user_annotations(None).with_related()[:largest]
+        )
+        if not recipes:
+            raise CommandError(
+                'В базе нет рецептов, сначала запустите generate_dataset.'
+            )
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        context = {'request': request, 'subscriptions': set()}
+
+        report = []
+        for page_size in options['page_sizes']:
+            # сериализация не входит в замер: сравниваем только рендеринг
+            data = RecipeListSerializer(
+                recipes[:page_size], many=True, context=context
+            ).data
+            expected = JSONRenderer().render(data)
+            if ORJSONRenderer().render(data) != expected:
+                raise CommandError(
+                    f'orjson расходится с JSONRenderer на {page_size} '
+                    f'рецептах.'
+                )
+            for name, renderer_class in RENDERERS:
+                result = self.measure(
+                    renderer_class(), data, options['repeat']
+                )
+                report.append({
+                    'renderer': name,
+                    'page_size': len(data),
+                    **result,
+                })
+                self.stdout.write(
+                    f'{name:<8} {len(data):>5} recipes: '
+                    f'p50 {result["p50_ms"]:8.3f} ms  '
+                    f'p99 {result["p99_ms"]:8.3f} ms  '
+                    f'peak {result["peak_kb"]:9.1f} KiB  '
+                    f'size {result["bytes"]:>9}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+
+    def measure(self, renderer, data, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = renderer.render(data)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        # трассировка памяти замедляет код, поэтому отдельным прогоном
+        tracemalloc.start()
+        renderer.render(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'peak_kb': round(peak / 1024, 1),
+            'bytes': len(content),
+        }
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from api.replicas import (
+    pin_to_primary,
+    read_alias,
+    replica_health,
+    route_request,
+)
+
+logger = logging.getLogger(__name__)
+
+# Замеры текущего запроса. sync_to_async копирует контекст в поток,
+# поэтому запросы к БД из пула потоков тоже попадают в замер
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Счётчики одного запроса: SQL-запросы и время по этапам."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_db_time = None
+        self.view_finished = None
+        self.view_name = None
+        self.action = None
+        # hit/miss кэша токенов, см. api.authentication
+        self.auth_cache = None
+        # асинхронные вьюхи ходят в БД из нескольких потоков сразу
+        self.lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.db_time += duration
+
+    def finish_view(self):
+        if self.view_finished is not None:
+            # api.async_views отмечает конец вьюхи до рендеринга
+            return
+        self.view_finished = time.perf_counter()
+        self.view_db_time = self.db_time
+
+    def timings(self):
+        """Длительности этапов в миллисекундах."""
+        finished = time.perf_counter()
+        # HttpResponse без отложенного рендеринга: всё время - вьюха
+        view_finished = self.view_finished or finished
+        view_db_time = self.db_time
+        if self.view_db_time is not None:
+            view_db_time = self.view_db_time
+        return {
+            'db': self.db_time * 1000,
+            # время вьюхи за вычетом походов в БД: сериализаторы,
+            # проверки прав и прочий код на Python вместе
+            'python': (
+                (view_finished - self.started - view_db_time) * 1000
+            ),
+            'render': (finished - view_finished) * 1000,
+            'total': (finished - self.started) * 1000,
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper соединения: пишет запрос в замер, если он идёт."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_recorder(connection, **kwargs):
+    # обёртки живут в объекте соединения и переживают переподключение
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryTimingMiddleware:
+    """
+    Число SQL-запросов и время БД, кода вьюхи и рендеринга для /api/.
+
+    Результат уходит в заголовки Server-Timing и X-Query-Count.
+    Доля замеряемых запросов задаётся REQUEST_METRICS_SAMPLE_RATE,
+    медленные и «тяжёлые» запросы пишутся в лог api.middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # так Django понимает, что middleware асинхронная
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def sampled(self, request):
+        rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if not request.path.startswith('/api/') or rate <= 0:
+            return False
+        return rate >= 1 or random.random() < rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+        metrics = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.set(None)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+        metrics = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.set(None)
+        return self.finish(request, response, metrics)
+
+    def start(self, request):
+        metrics = request.metrics = RequestMetrics()
+        current_metrics.set(metrics)
+        # соединения этого потока могли открыться до загрузки модуля
+        for connection in connections.all():
+            install_query_recorder(connection)
+        return metrics
+
+    def finish(self, request, response, metrics):
+        timings = metrics.timings()
+        response['Server-Timing'] = self.server_timing(metrics, timings)
+        response['X-Query-Count'] = str(metrics.queries)
+        self.log_outlier(request, response, metrics, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is None:
+            return
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is not None:
+            metrics.view_name = view_class.__name__
+        else:
+            metrics.view_name = view_func.__name__
+        # у вьюсетов DRF метод HTTP -> действие
+        actions = getattr(view_func, 'actions', None) or {}
+        metrics.action = actions.get(request.method.lower())
+
+    def process_template_response(self, request, response):
+        # вызывается после вьюхи, но до response.render()
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.finish_view()
+        return response
+
+    def server_timing(self, metrics, timings):
+        parts = [
+            f'db;dur={timings["db"]:.1f};desc="{metrics.queries} queries"'
+        ]
+        parts += [
+            f'{name};dur={timings[name]:.1f}'
+            for name in ('python', 'render', 'total')
+        ]
+        if metrics.auth_cache is not None:
+            parts.append(f'auth;desc="{metrics.auth_cache}"')
+        return ', '.join(parts)
+
+    def log_outlier(self, request, response, metrics, timings):
+        if (
+            timings['total'] < settings.REQUEST_METRICS_SLOW_MS
+            and metrics.queries < settings.REQUEST_METRICS_MAX_QUERIES
+        ):
+            return
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': metrics.view_name,
+            'action': metrics.action,
+            'queries': metrics.queries,
+            'auth_cache': metrics.auth_cache,
+            **{
+                f'{name}_ms': round(value, 1)
+                for name, value in timings.items()
+            },
+        }, ensure_ascii=False))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Чтения /api/ - с реплик, запись - в основную базу (api.replicas).
+
+    После записи клиент на DB_REPLICA_PIN_SECONDS закрепляется за
+    основной базой и видит свои изменения.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = read_alias.set(route_request(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        # кэш и проверка реплик - синхронный ввод-вывод
+        alias = await sync_to_async(route_request, thread_sensitive=False)(
+            request
+        )
+        token = read_alias.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        await sync_to_async(pin_to_primary, thread_sensitive=False)(request)
+        return response
+
+    def process_exception(self, request, exception):
+        # упавшую реплику не трогаем до следующей проверки
+        alias = read_alias.get()
+        if alias is not None and isinstance(exception, DatabaseError):
+            replica_health.mark_down(alias)
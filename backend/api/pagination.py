@@ -1,5 +1,131 @@
-from rest_framework.pagination import PageNumberPagination
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
+
+from recipes.feed import after_key
+
+MAX_PAGE_SIZE = 100
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Курсор по ключу (pub_date, id) крайнего рецепта страницы.
+
+    Стандартный CursorPagination кладёт в курсор только первое поле
+    порядка и различает равные даты смещением: при нескольких рецептах
+    с одной pub_date страницы теряли или повторяли строки. Здесь курсор
+    хранит ключ целиком, страница начинается строго после него.
+    """
+
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def start_page(self, request):
+        """Ключ, после которого начинается страница, и направление."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        # пустой ?cursor= - первая страница
+        if self.cursor is None or self.cursor.position is None:
+            self.cursor = None
+            return None, False
+        return self.decode_key(self.cursor.position), self.cursor.reverse
+
+    def finish_page(self, items, reverse):
+        """
+        Строки страницы, новые сверху.
+
+        items - строки по ходу листания с одной лишней: по ней видно,
+        есть ли страница дальше. Ключи страницы для ссылок next и
+        previous вызывающий кладёт в self.page.
+        """
+        has_more = len(items) > self.page_size
+        items = items[:self.page_size]
+        if reverse:
+            items.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return items
+
+    def decode_key(self, position):
+        pub_date, _, recipe_id = (position or '').rpartition('|')
+        try:
+            key = parse_datetime(pub_date), int(recipe_id)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if key[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    def encode_key(self, key, reverse):
+        pub_date, recipe_id = key
+        return self.encode_cursor(Cursor(
+            offset=0,
+            reverse=reverse,
+            position=f'{pub_date.isoformat()}|{recipe_id}',
+        ))
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_key(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_key(self.page[0], reverse=True)
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    """
+    Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Включается параметром ?cursor= (пустое значение - первая страница),
+    ссылки next/previous содержат курсор следующей страницы.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        key, reverse = self.start_page(request)
+        if key is not None:
+            queryset = after_key(queryset, 'id', key, reverse)
+        ordering = ('pub_date', 'id') if reverse else self.ordering
+        recipes = self.finish_page(
+            list(queryset.order_by(*ordering)[:self.page_size + 1]), reverse
+        )
+        self.page = [(recipe.pub_date, recipe.pk) for recipe in recipes]
+        return recipes
+
+
+class FeedCursorPagination(KeysetCursorPagination):
+    """
+    Курсор ленты подписок.
+
+    Страницу собирают из нескольких источников (recipes.feed), поэтому
+    ключи страницы отдаёт fetch_keys, а не queryset.
+    """
+
+    def paginate_feed(self, request, fetch_keys):
+        """
+        Id рецептов страницы, новые сверху.
+
+        fetch_keys(key, reverse, limit) отдаёт ключи (pub_date, id)
+        после key по ходу листания.
+        """
+        key, reverse = self.start_page(request)
+        self.page = self.finish_page(
+            fetch_keys(key, reverse, self.page_size + 1), reverse
+        )
+        return [recipe_id for _, recipe_id in self.page]
@@ -0,0 +1,46 @@
+import re
+from io import BytesIO
+
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+# orjson молча читает целые больше 64 бит как float с потерей точности;
+# в таких числах не меньше 19 цифр
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser на orjson.
+
+    Тела не в UTF-8, с длинными числами и всё, что orjson не разобрал,
+    уходят в стандартный парсер: результат и ошибки как у него.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if not LONG_NUMBER.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(BytesIO(body), media_type, parser_context)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(
+                f'MessagePack parse error - {exc or type(exc).__name__}'
+            )
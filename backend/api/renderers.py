@@ -0,0 +1,166 @@
+import abc
+import csv
+import json
+import math
+import re
+from decimal import Decimal
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# типы, которых нет в JSON (Decimal, datetime, ленивые строки),
+# приводятся так же, как в стандартном JSONRenderer
+encode_default = JSONEncoder().default
+
+# число с экспонентой в выводе orjson: 1e16, 1e-7
+EXPONENT = re.compile(rb'[0-9]e-?[0-9]')
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(abc.ABC, BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Нужен для выбора формата через ?format= или заголовок Accept,
+    сам файл отдаётся построчно через stream().
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # сюда попадают только ответы с ошибками
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    @abc.abstractmethod
+    def stream(self, rows):
+        """Генератор строк файла из (name, measurement_unit, amount)."""
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(_Echo())
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class ShoppingListTXTRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        for name, unit, amount in rows:
+            yield f'{name} ({unit}) — {amount}\n'
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, rows):
+        separator = '['
+        for name, unit, amount in rows:
+            yield separator + json.dumps(
+                {'name': name, 'measurement_unit': unit, 'amount': amount},
+                ensure_ascii=False,
+            )
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+
+def iter_floats(data):
+    """Числа float и Decimal во вложенных словарях и списках."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, (float, Decimal)):
+            yield value
+
+
+def has_non_finite(data):
+    """Есть ли в данных NaN или бесконечность."""
+    return any(not math.isfinite(value) for value in iter_floats(data))
+
+
+def has_exponent(data):
+    """Есть ли в данных числа, которые пишутся с экспонентой."""
+    return any('e' in repr(float(value)) for value in iter_floats(data))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson, байт в байт как стандартный.
+
+    Отступы, ensure_ascii, нестрогий JSON, числа с экспонентой и то,
+    что orjson сериализовать не может (например, целые больше 64 бит),
+    уходят в стандартный рендерер.
+    """
+
+    # datetime и dataclass приводит encode_default, как в DRF
+    options = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (
+            indent is not None
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=encode_default, option=self.options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson пишет 1e16 и 1e-7, а стандартный рендерер - 1e+16
+        # и 1e-07. Совпадение внутри строки стоит лишь обхода данных
+        if EXPONENT.search(ret) and has_exponent(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson пишет NaN и бесконечность как null, а стандартный
+        # рендерер в строгом режиме отказывается их сериализовать
+        if b'null' in ret and has_non_finite(data):
+            raise ValueError(
+                'Out of range float values are not JSON compliant'
+            )
+        # стандартный рендерер экранирует разделители строк для JS
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Ответ в MessagePack для клиентов с Accept: application/msgpack."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
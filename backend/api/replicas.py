@@ -0,0 +1,174 @@
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+# Реплика, с которой читает текущий запрос; None - основная база.
+# sync_to_async копирует контекст, так что и пул потоков async-вьюх
+# читает оттуда же
+read_alias = ContextVar('read_alias', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Токены читаем с основной: выход из системы должен работать сразу
+PRIMARY_ONLY_APPS = ('authtoken',)
+# Отставание реплики PostgreSQL в секундах. Если всё полученное уже
+# применено, оно нулевое: иначе простой основной базы без записей
+# выглядел бы как отставание
+POSTGRES_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END'
+)
+
+
+class ReplicaHealth:
+    """
+    Какие реплики можно читать.
+
+    Реплика проверяется не чаще раза в DB_REPLICA_CHECK_INTERVAL
+    секунд: отвечает ли она и не отстала ли больше чем на
+    DB_REPLICA_MAX_LAG секунд.
+    """
+
+    def __init__(self):
+        # alias -> (жива ли, time.monotonic() проверки)
+        self.checked = {}
+        self.lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        healthy, checked_at = self.checked.get(alias, (True, None))
+        if (
+            checked_at is not None
+            and time.monotonic() - checked_at
+            < settings.DB_REPLICA_CHECK_INTERVAL
+        ):
+            return healthy
+        # проверяет один поток, остальные пока верят прошлому результату
+        if not self.lock.acquire(blocking=False):
+            return healthy
+        try:
+            healthy = self.check(alias)
+            self.checked[alias] = (healthy, time.monotonic())
+        finally:
+            self.lock.release()
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor != 'postgresql':
+                    cursor.execute('SELECT 1')
+                    return True
+                cursor.execute(POSTGRES_LAG_SQL)
+                lag = cursor.fetchone()[0] or 0
+        except DatabaseError:
+            connection.close()
+            return False
+        return lag <= settings.DB_REPLICA_MAX_LAG
+
+    def mark_down(self, alias):
+        self.checked[alias] = (False, time.monotonic())
+
+
+replica_health = ReplicaHealth()
+
+
+def pin_key(request):
+    """Ключ закрепления за основной базой: по токену клиента."""
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    digest = hashlib.sha256(authorization.encode()).hexdigest()
+    return f'db-pin:{digest}'
+
+
+def route_request(request):
+    """Реплика для чтений запроса или None - читать с основной."""
+    if (
+        not settings.DATABASE_REPLICAS
+        or request.method not in SAFE_METHODS
+        or not request.path.startswith('/api/')
+    ):
+        return None
+    key = pin_key(request)
+    if key is not None and cache.get(key):
+        return None
+    healthy = [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if replica_health.is_healthy(alias)
+    ]
+    return random.choice(healthy) if healthy else None
+
+
+def pin_to_primary(request):
+    """
+    После записи клиент какое-то время читает с основной базы.
+
+    Иначе сразу после добавления в избранное или создания рецепта
+    он может не увидеть изменений на отстающей реплике.
+    """
+    if not settings.DATABASE_REPLICAS or request.method in SAFE_METHODS:
+        return
+    key = pin_key(request)
+    if key is not None:
+        cache.set(key, True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def recently_changed(changed_at):
+    """
+    Могло ли изменение из changed_at ещё не дойти до реплик.
+
+    changed_at - секунды последней версии. Реплика читается, пока
+    отстаёт не больше DB_REPLICA_MAX_LAG, а проверяется раз в
+    DB_REPLICA_CHECK_INTERVAL секунд.
+    """
+    window = settings.DB_REPLICA_MAX_LAG + settings.DB_REPLICA_CHECK_INTERVAL
+    # changed_at округлён вниз до секунды
+    return time.time() - changed_at < window + 1
+
+
+@contextmanager
+def fresh_reads(changed_at):
+    """
+    Чтения блока - с основной базы, если данные менялись недавно.
+
+    Ответ, собранный с отстающей реплики, лёг бы в кэш и ушёл в ETag
+    под уже новой версией таблиц и оставался бы устаревшим до
+    следующего изменения.
+    """
+    if read_alias.get() is None or not recently_changed(changed_at):
+        yield
+        return
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Чтения из запросов к API - с реплики, всё остальное - с default."""
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias.get()
+        if alias is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        # внутри транзакции читаем только что записанное
+        if connections['default'].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - копии default, связи между ними допустимы
+        return True
@@ -1,9 +1,15 @@
 import base64
+from collections import Counter
+from uuid import uuid4
 
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 
+from recipes.images import IMAGE_VARIANTS
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -11,11 +17,18 @@ from recipes.models import (
     RecipeIngredient,
     RecipeTag,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
     User,
 )
+from recipes.search import refresh_recipe_search
+from recipes.shopping_list import recipe_clients, refresh_shopping_lists
+from recipes.versions import bump_table_version
 from users.models import Subscription
 
+# Сколько рецептов можно передать в одном пакетном запросе
+MAX_BATCH_SIZE = 100
+
 
 class Base64ImageField(serializers.ImageField):
     """Поле картинки по теории Практикума"""
@@ -24,7 +37,9 @@ class Base64ImageField(serializers.ImageField):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = ContentFile(
+                base64.b64decode(imgstr), name=f'{uuid4().hex}.{ext}'
+            )
         return super().to_internal_value(data)
 
 
@@ -43,6 +58,10 @@ class UserListRetrieveSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, data):
+        # набор подписок вьюсет кладёт в контекст одним запросом,
+        # djoser его не передаёт - тогда проверяем по одному автору
+        if 'subscriptions' in self.context:
+            return data.id in self.context['subscriptions']
         current_user = self.context.get('request').user.id
         author = data.id
         return Subscription.objects.filter(
@@ -95,28 +114,41 @@ class RecipeListSerializer(serializers.ModelSerializer):
         required=False,
         allow_null=True
     )
+    images = serializers.SerializerMethodField()
+
+    def get_images(self, obj):
+        """Уменьшенные копии картинки и srcset для JPEG и WebP."""
+        if not obj.image_variants:
+            return None
+        request = self.context.get('request')
+        images = {}
+        srcset = {'jpeg': [], 'webp': []}
+        # jsonb не хранит порядок ключей, идём по IMAGE_VARIANTS
+        for label, _ in IMAGE_VARIANTS:
+            variant = obj.image_variants[label]
+            images[label] = {'width': variant['width']}
+            for key in srcset:
+                url = default_storage.url(variant[key])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                images[label][key] = url
+                srcset[key].append(f'{url} {variant["width"]}w')
+        images['srcset'] = ', '.join(srcset['jpeg'])
+        images['webp_srcset'] = ', '.join(srcset['webp'])
+        return images
 
     def get_ingredients(self, obj):
         """Возвращает отдельный сериализатор."""
-        if self.context['recipe-ingredient']:
-            return RecipeIngredientSerializer(
-                self.context['recipe-ingredient'],
-                many=True
-            ).data
+        # recipeingredient_set подгружен в Recipe.objects.with_related()
         return RecipeIngredientSerializer(
-            RecipeIngredient.objects.filter(recipe=obj).all(),
+            obj.recipeingredient_set.all(),
             many=True
         ).data
 
     def get_tags(self, obj):
         """Возвращает отдельный сериализатор."""
-        if self.context['recipe-tag']:
-            return RecipeTagSerializer(
-                self.context['recipe-tag'],
-                many=True
-            ).data
         return RecipeTagSerializer(
-            RecipeTag.objects.filter(recipe_id=obj).all(),
+            obj.recipetag_set.all(),
             many=True
         ).data
 
@@ -131,6 +163,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
@@ -140,10 +173,9 @@ class IngredientCreateInRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор ингредиентов в создании рецепта."""
 
     recipe = serializers.PrimaryKeyRelatedField(read_only=True)
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient',
-        queryset=Ingredient.objects.all()
-    )
+    # существование проверяет RecipeCreateUpdateSerializer
+    # одним запросом на весь список
+    id = serializers.IntegerField(min_value=1)
     amount = serializers.IntegerField(write_only=True, min_value=1)
 
     class Meta:
@@ -165,11 +197,43 @@ class TagCreateInRecipeSerializer(serializers.ModelSerializer):
         fields = ('recipe', 'id')
 
 
+def check_ids(model, ids, duplicate_message, missing_message):
+    """Повторы и отсутствующие в БД id: один запрос на весь список."""
+    duplicates = sorted(pk for pk, total in Counter(ids).items() if total > 1)
+    if duplicates:
+        raise serializers.ValidationError(
+            f'{duplicate_message}: {", ".join(map(str, duplicates))}.'
+        )
+    found = set(model.objects.filter(id__in=ids).values_list('id', flat=True))
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        raise serializers.ValidationError(
+            f'{missing_message}: {", ".join(map(str, missing))}.'
+        )
+
+
+def changed_fields(instance, data):
+    """Поля из data, значения которых отличаются от сохранённых."""
+    changed = []
+    for name, value in data.items():
+        current = getattr(instance, name)
+        if isinstance(current, FieldFile):
+            # новый файл - всегда изменение, None - только если файл был
+            if value is None and not current:
+                continue
+        elif current == value:
+            continue
+        changed.append(name)
+    return changed
+
+
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Сериализатор создания/обновления рецепта."""
 
     ingredients = IngredientCreateInRecipeSerializer(many=True)
-    tags = serializers.ListField(min_length=1)
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1
+    )
     image = Base64ImageField(required=False, allow_null=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -185,51 +249,133 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Добавьте хотя бы один ингредиент."
             )
+        check_ids(
+            Ingredient,
+            [item['id'] for item in value],
+            'Ингредиенты в рецепте не должны повторяться',
+            'Нет ингредиентов с id',
+        )
+        return value
+
+    def validate_tags(self, value):
+        check_ids(
+            Tag,
+            value,
+            'Теги в рецепте не должны повторяться',
+            'Нет тегов с id',
+        )
         return value
 
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(**validated_data)
-
-        create_ingredients = [
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=ingredient['ingredient'],
-                amount=ingredient['amount'],
+        # id уже проверены в validate_*, связи пишем по ним без выборок
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredient['id'],
+                    amount=ingredient['amount'],
+                )
+                for ingredient in ingredients
             )
-            for ingredient in ingredients
-        ]
-
-        create_tags = [
-            RecipeTag(
-                recipe=recipe,
-                tag=Tag.objects.get(id=tag),
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe=recipe, tag_id=tag_id) for tag_id in tags
             )
-            for tag in tags
-        ]
-
-        RecipeIngredient.objects.bulk_create(create_ingredients)
-
-        RecipeTag.objects.bulk_create(create_tags)
-
+            # bulk_create не шлёт сигналы, документ для поиска
+            # обновляем сами
+            refresh_recipe_search([recipe.pk])
         return recipe
 
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients', None)
-        if ingredients is not None:
-            instance.ingredients.clear()
+        """
+        Пишет только разницу с тем, что уже сохранено.
 
-            create_ingredients = [
-                RecipeIngredient(
-                    recipe=instance,
-                    ingredient=ingredient['ingredient'],
-                    amount=ingredient['amount'],
-                )
-                for ingredient in ingredients
-            ]
-            RecipeIngredient.objects.bulk_create(create_ingredients)
-        return super().update(instance, validated_data)
+        Неизменённые строки ингредиентов и тегов не трогаются,
+        рецепт сохраняется с update_fields и только если поменялся.
+        """
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        with transaction.atomic():
+            ingredients_changed = (
+                ingredients is not None
+                and self.update_ingredients(instance, ingredients)
+            )
+            if tags is not None and self.update_tags(instance, tags):
+                bump_table_version(RecipeTag)
+
+            # сохраняем после связей: сигнал post_save пересобирает
+            # поисковый документ уже с новыми ингредиентами
+            update_fields = changed_fields(instance, validated_data)
+            for name in update_fields:
+                setattr(instance, name, validated_data[name])
+            if update_fields:
+                instance.save(update_fields=update_fields)
+            elif ingredients_changed:
+                refresh_recipe_search([instance.pk])
+        return instance
+
+    def update_ingredients(self, recipe, ingredients):
+        """Вставки, правки и удаления ингредиентов; True, если были."""
+        wanted = {
+            item['id']: item['amount'] for item in ingredients
+        }
+        current = {
+            row.ingredient_id: row
+            for row in recipe.recipeingredient_set.all()
+        }
+        stale = [
+            row
+            for ingredient_id, row in current.items()
+            if ingredient_id not in wanted
+        ]
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = wanted.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        created = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in wanted.items()
+            if ingredient_id not in current
+        ]
+        if not (stale or changed or created):
+            return False
+
+        if stale:
+            # поиск, списки покупок и версию таблицы для удалённых
+            # строк обновляют сигналы post_delete
+            RecipeIngredient.objects.filter(
+                pk__in=[row.pk for row in stale]
+            ).delete()
+        if changed or created:
+            # bulk-операции сигналов не шлют
+            if changed:
+                RecipeIngredient.objects.bulk_update(changed, ('amount',))
+            RecipeIngredient.objects.bulk_create(created)
+            refresh_shopping_lists(
+                recipe_clients([recipe.pk]),
+                [row.ingredient_id for row in changed + created],
+            )
+            bump_table_version(RecipeIngredient)
+        return True
+
+    def update_tags(self, recipe, tags):
+        """Добавляет и удаляет теги рецепта; True, если были изменения."""
+        current = {row.tag_id for row in recipe.recipetag_set.all()}
+        wanted = set(tags)
+        stale = current - wanted
+        if stale:
+            RecipeTag.objects.filter(recipe=recipe, tag_id__in=stale).delete()
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id)
+            for tag_id in wanted - current
+        )
+        return bool(stale or wanted - current)
 
     def to_representation(self, obj):
         """Возвращаем прдеставление в таком же виде, как и GET-запрос."""
@@ -240,12 +386,12 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         representation = super().to_representation(obj)
 
         representation['ingredients'] = RecipeIngredientSerializer(
-            self.context['recipe-ingredient'],
+            obj.recipeingredient_set.select_related('ingredient'),
             many=True
         ).data
 
         representation['tags'] = RecipeTagSerializer(
-            self.context['recipe-tag'],
+            obj.recipetag_set.select_related('tag'),
             many=True
         ).data
 
@@ -272,15 +418,42 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = '__all__'
 
 
+class RecipeShortSerializer(serializers.ModelSerializer):
+    """Короткая карточка рецепта."""
+
+    image = serializers.ImageField(read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id',
+            'name',
+            'image',
+            'cooking_time',
+        )
+
+
 class UserInSubscriptionSerializer(UserListRetrieveSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -296,12 +469,12 @@ class UserInSubscriptionSerializer(UserListRetrieveSerializer):
         )
 
     def get_recipes(self, data):
-        author_id = data.id
-        recipes_queryset = Recipe.objects.filter(author_id=author_id)
-        return recipes_queryset.values()
-
-    def get_recipes_count(self, data):
-        return len(Recipe.objects.filter(author_id=data.id))
+        # recipes подгружены во вьюсете уже с учётом recipes_limit,
+        # срез нужен, если автор пришёл без prefetch_related
+        recipes = data.recipes.all()[:self.context.get('recipes_limit')]
+        return RecipeShortSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -331,28 +504,23 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return obj.id in self.context['subscriptions']
 
     def get_recipes(self, data):
-        author_id = int(
-            self.context.get('request')
-            .parser_context.get('kwargs')
-            .get('user_id')
-        )
-        recipes_queryset = Recipe.objects.filter(author_id=author_id)
-        return recipes_queryset.values()
+        recipes = data.author.recipes.all()[
+            :self.context.get('recipes_limit')
+        ]
+        return RecipeShortSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
     def get_recipes_count(self, data):
-        author_id = int(
-            self.context.get('request')
-            .parser_context.get('kwargs')
-            .get('user_id')
-        )
-        return len(Recipe.objects.filter(author_id=author_id))
+        return data.author.recipes_count
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
-    id = serializers.SerializerMethodField()
-    name = serializers.SerializerMethodField()
+    # рецепт уже загружен во вьюхе, повторно в БД не ходим
+    id = serializers.ReadOnlyField(source='recipe.id')
+    name = serializers.ReadOnlyField(source='recipe.name')
     image = serializers.StringRelatedField(source='recipe.image')
-    cooking_time = serializers.SerializerMethodField()
+    cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
         model = Favorite
@@ -363,29 +531,6 @@ class FavoriteSerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
-    def get_id(self, data):
-        return int(
-            self.context.get('request')
-            .parser_context.get('kwargs')
-            .get('recipe_id')
-        )
-
-    def get_name(self, data):
-        recipe_id = int(
-            self.context.get('request')
-            .parser_context.get('kwargs')
-            .get('recipe_id')
-        )
-        return Recipe.objects.get(id=recipe_id).name
-
-    def get_cooking_time(self, data):
-        recipe_id = int(
-            self.context.get('request')
-            .parser_context.get('kwargs')
-            .get('recipe_id')
-        )
-        return Recipe.objects.get(id=recipe_id).cooking_time
-
 
 class ShoppingCartSerializer(FavoriteSerializer):
     class Meta:
@@ -396,3 +541,17 @@ class ShoppingCartSerializer(FavoriteSerializer):
             'image',
             'cooking_time',
         )
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_BATCH_SIZE,
+    )
+
+    def validate_ids(self, value):
+        # порядок сохраняем, повторы выбрасываем
+        return list(dict.fromkeys(value))
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_tokens
+from users.models import User
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_token(instance, **kwargs):
+    # выход через djoser удаляет токен
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(instance, created, update_fields=None, **kwargs):
+    # смена пароля, блокировка и любые правки профиля; вход в
+    # систему меняет только last_login, кэш от этого не устаревает
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    forget_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
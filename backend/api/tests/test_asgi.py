@@ -0,0 +1,189 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache, caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.async_views import DETAIL_ACTIONS, LIST_ACTIONS, async_view
+from api.views import RecipeViewSet
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from users.models import User
+
+
+class ASGIDownloadTest(TestCase):
+    """Список покупок скачивается через настоящий ASGIHandler."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@test.ru',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестов',
+            password='cook-password',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Суп', text='Сварить.', cooking_time=30
+        )
+        for name, amount in (('Картофель', 300), ('Морковь', 100)):
+            RecipeIngredient.objects.create(
+                recipe=recipe,
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit='г'
+                ),
+                amount=amount,
+            )
+        ShoppingCart.objects.create(client=cls.user, recipe=recipe)
+
+    def setUp(self):
+        for alias in ('default', 'auth'):
+            caches[alias].clear()
+        # как тестовый клиент Django: иначе обработчик закроет
+        # соединение, в транзакции которого живут данные теста
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+
+    def asgi_get(self, path, query_string=b''):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query_string,
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+            'client': ('127.0.0.1', 12345),
+            'server': ('testserver', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(ASGIHandler())(scope, receive, send)
+        start = messages[0]
+        body = b''.join(
+            message.get('body', b'')
+            for message in messages
+            if message['type'] == 'http.response.body'
+        )
+        headers = {name.lower(): value for name, value in start['headers']}
+        return start['status'], headers, body
+
+    def test_download_txt(self):
+        status, headers, body = self.asgi_get(
+            '/api/recipes/download_shopping_cart/', b'format=txt'
+        )
+        self.assertEqual(status, 200)
+        self.assertIn(b'shopping_list.txt', headers[b'content-disposition'])
+        self.assertEqual(
+            body.decode(),
+            'Картофель (г) — 300\nМорковь (г) — 100\n',
+        )
+
+    def test_download_csv(self):
+        status, headers, body = self.asgi_get(
+            '/api/recipes/download_shopping_cart/', b'format=csv'
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            body.decode(), 'Картофель,г,300\r\nМорковь,г,100\r\n'
+        )
+
+
+class AsyncViewTest(TestCase):
+    """Вьюсет в пуле потоков отвечает так же, как без обёртки."""
+
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@test.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Тестов',
+            password='author-password',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Суп', text='Сварить.', cooking_time=30
+        )
+        for name in ('Каша', 'Омлет'):
+            Recipe.objects.create(
+                author=author, name=name, text='Смешать.', cooking_time=5
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.close = mock.Mock()
+        # данные теста видит только соединение основного потока,
+        # в его транзакции они и живут: его не закрываем
+        for target, new in (
+            (
+                'api.async_views.sync_to_async',
+                lambda func, thread_sensitive: sync_to_async(func),
+            ),
+            ('api.async_views.close_old_connections', self.close),
+        ):
+            patcher = mock.patch(target, new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def call(self, sync_view, path, **kwargs):
+        request = self.factory.get(path, SERVER_NAME='localhost')
+        return async_to_sync(async_view(sync_view))(request, **kwargs)
+
+    def test_same_response(self):
+        sync_view = RecipeViewSet.as_view(LIST_ACTIONS)
+        for path in ('/api/recipes/?limit=2', '/api/recipes/?page=2&limit=2'):
+            with self.subTest(path=path):
+                cache.clear()
+                expected = sync_view(
+                    self.factory.get(path, SERVER_NAME='localhost')
+                ).render()
+                cache.clear()
+                response = self.call(sync_view, path)
+                # отрендерен в потоке пула, вместе с вьюсетом
+                self.assertTrue(response.is_rendered)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+                # кэш ответов вьюсета тоже работает
+                self.assertIn('ETag', response)
+
+    def test_connections_closed_on_every_path(self):
+        def failing_view(request):
+            raise ValueError('сбой вьюхи')
+
+        detail = RecipeViewSet.as_view(DETAIL_ACTIONS)
+        pk = self.recipe.pk
+        for sync_view, path, kwargs in (
+            (detail, f'/api/recipes/{pk}/', {'pk': pk}),
+            (detail, '/api/recipes/0/', {'pk': 0}),
+            (failing_view, '/api/recipes/', {}),
+        ):
+            with self.subTest(path=path, view=sync_view):
+                self.close.reset_mock()
+                try:
+                    self.call(sync_view, path, **kwargs)
+                except ValueError:
+                    pass
+                # до запроса и после него
+                self.assertEqual(self.close.call_count, 2)
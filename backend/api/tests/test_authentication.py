@@ -0,0 +1,59 @@
+import pickle
+
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache_key
+from users.models import User
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """В кэше токенов нет хеша пароля, а пользователь - полноценный."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@test.ru',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестов',
+            password='cook-password',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        caches['auth'].clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def me(self):
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_no_password_in_cache(self):
+        first = self.me()
+        cached = caches['auth'].get(token_cache_key(self.token.key))
+        self.assertIsNotNone(cached)
+        _, fields = cached
+        self.assertNotIn('password', fields)
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(cached))
+        # из кэша - тот же пользователь
+        self.assertEqual(self.me(), first)
+
+    def test_set_password_on_cache_hit(self):
+        self.me()
+        # пароль проверяется по отложенному полю, прочитанному из БД
+        response = self.client.post(
+            '/api/users/set_password/',
+            {
+                'current_password': 'cook-password',
+                'new_password': 'new-cook-password',
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-cook-password'))
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingListItem,
+)
+from users.models import User
+
+
+class BatchRelationTest(TestCase):
+    """Пакетное удаление обновляет счётчики и список покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@test.ru',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестов',
+            password='cook-password',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        potato = Ingredient.objects.create(
+            name='Картофель', measurement_unit='г'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user, name=name, text='Сварить.', cooking_time=30
+            )
+            for name in ('Суп', 'Пюре', 'Драники')
+        ]
+        for recipe in cls.recipes:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=potato, amount=100
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def batch(self, method, relation, recipes):
+        response = getattr(self.client, method)(
+            f'/api/recipes/{relation}/',
+            {'ids': [recipe.pk for recipe in recipes]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return [result['status'] for result in response.data['results']]
+
+    def counters(self, field):
+        return list(
+            Recipe.objects.order_by('pk').values_list(field, flat=True)
+        )
+
+    def test_favorite(self):
+        self.batch('post', 'favorite', self.recipes)
+        self.assertEqual(self.counters('favorites_count'), [1, 1, 1])
+        statuses = self.batch('delete', 'favorite', self.recipes[:2])
+        self.assertEqual(statuses, ['deleted', 'deleted'])
+        self.assertEqual(self.counters('favorites_count'), [0, 0, 1])
+
+    def test_shopping_cart(self):
+        self.batch('post', 'shopping_cart', self.recipes)
+        self.assertEqual(self.counters('in_carts_count'), [1, 1, 1])
+        self.batch('delete', 'shopping_cart', self.recipes[:2])
+        self.assertEqual(self.counters('in_carts_count'), [0, 0, 1])
+        self.assertEqual(
+            list(ShoppingListItem.objects.values_list('amount', flat=True)),
+            [100],
+        )
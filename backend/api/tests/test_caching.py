@@ -0,0 +1,51 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from recipes.models import Tag
+
+
+class ConditionalGetTest(TestCase):
+    """Условный GET не отдаёт устаревший 304 после записи."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        # версии таблиц в миллисекундах, а вся проверка укладывается
+        # в одну секунду
+        now = time.time()
+        patcher = mock.patch('recipes.versions.time.time', return_value=now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = now
+
+    def tag_names(self, response):
+        return [tag['name'] for tag in response.json()]
+
+    def test_write_in_same_second(self):
+        first = self.client.get('/api/tags/')
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Last-Modified', first)
+        etag = first['ETag']
+        self.assertEqual(
+            self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+            .status_code,
+            304,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Обед', slug='lunch')
+
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': etag},
+            {'HTTP_IF_MODIFIED_SINCE': http_date(self.now + 1)},
+        ):
+            with self.subTest(headers=headers):
+                response = self.client.get('/api/tags/', **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.tag_names(response), ['Обед'])
+                self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,115 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, RecipeTag, Tag
+from users.models import User
+
+
+class TaggedRecipesMixin:
+    """Рецепты с тегами завтрак и ужин у двух авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, other = (
+            User.objects.create_user(
+                email=f'{username}@test.ru',
+                username=username,
+                first_name='Автор',
+                last_name='Тестов',
+                password=f'{username}-password',
+            )
+            for username in ('author', 'other')
+        )
+        breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        dinner = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.omelette, cls.soup, cls.porridge = (
+            Recipe.objects.create(
+                author=cls.author,
+                name=name,
+                text='Смешать.',
+                cooking_time=5,
+            )
+            for name in ('Омлет', 'Суп', 'Каша')
+        )
+        stew = Recipe.objects.create(
+            author=other, name='Рагу', text='Потушить.', cooking_time=60
+        )
+        RecipeTag.objects.bulk_create(
+            (
+                RecipeTag(recipe=cls.omelette, tag=breakfast),
+                RecipeTag(recipe=cls.soup, tag=dinner),
+                RecipeTag(recipe=cls.porridge, tag=breakfast),
+                RecipeTag(recipe=cls.porridge, tag=dinner),
+                RecipeTag(recipe=stew, tag=dinner),
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_names(self, query):
+        return {recipe['name'] for recipe in self.get(query)['results']}
+
+
+class TagsFilterTest(TaggedRecipesMixin, TestCase):
+    """?tags= по слагам: неизвестный тег даёт пустой список, не 400."""
+
+    def test_unknown_tag(self):
+        self.assertEqual(self.get_names('tags=unknown'), set())
+
+    def test_any_tag(self):
+        self.assertEqual(
+            self.get_names('tags=breakfast&tags=unknown'), {'Омлет', 'Каша'}
+        )
+
+    def test_all_tags(self):
+        self.assertEqual(
+            self.get_names('tags=breakfast&tags=dinner&tags_mode=all'),
+            {'Каша'},
+        )
+        self.assertEqual(
+            self.get_names('tags=breakfast&tags=unknown&tags_mode=all'),
+            set(),
+        )
+
+
+class TagFacetsTest(TaggedRecipesMixin, TestCase):
+    """tag_facets считает рецепты по тегам без учёта ?tags=."""
+
+    def get_facets(self, query):
+        return self.get(query)['tag_facets']
+
+    def test_counts(self):
+        self.assertEqual(
+            self.get_facets(''), {'breakfast': 2, 'dinner': 3}
+        )
+
+    def test_tags_do_not_narrow_facets(self):
+        for query in (
+            'tags=breakfast',
+            'tags=breakfast&tags=dinner&tags_mode=all',
+            'tags=unknown&tags_mode=all',
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.get_facets(query), {'breakfast': 2, 'dinner': 3}
+                )
+
+    def test_other_filters_narrow_facets(self):
+        author = f'author={self.author.pk}'
+        self.assertEqual(
+            self.get_facets(author), {'breakfast': 2, 'dinner': 2}
+        )
+        query = f'{author}&tags=breakfast&tags=dinner&tags_mode=all'
+        self.assertEqual(self.get_names(query), {'Каша'})
+        self.assertEqual(
+            self.get_facets(query), {'breakfast': 2, 'dinner': 2}
+        )
+        self.assertEqual(self.get_facets('search=Рагу'), {'dinner': 1})
@@ -0,0 +1,210 @@
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCart,
+    Tag,
+)
+from recipes.relations import RELATIONS
+from users.models import Subscription, User
+
+
+def unique_index_name(model, constraint_name):
+    """
+    Имя индекса, которым БД обеспечивает UniqueConstraint.
+
+    PostgreSQL называет индекс как ограничение, а SQLite создаёт
+    безымянный sqlite_autoindex_*: ищем его по столбцам.
+    """
+    if connection.vendor != 'sqlite':
+        return constraint_name
+    (constraint,) = (
+        constraint
+        for constraint in model._meta.constraints
+        if constraint.name == constraint_name
+    )
+    columns = [
+        model._meta.get_field(field).column for field in constraint.fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA index_list({model._meta.db_table})')
+        names = [row[1] for row in cursor.fetchall()]
+        for name in names:
+            cursor.execute(f'PRAGMA index_info("{name}")')
+            if [row[2] for row in cursor.fetchall()] == columns:
+                return name
+    raise AssertionError(f'Нет индекса для {constraint_name}')
+
+
+class IndexUsageTest(TestCase):
+    """Частые выборки из api/views.py идут по составным индексам."""
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # на пустых таблицах планировщик предпочёл бы Seq Scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assert_uses_index(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_favorite_lookup(self):
+        self.assert_uses_index(
+            Favorite.objects.filter(follower_id=1, recipe_id=1),
+            unique_index_name(Favorite, 'unique_favorite_follower_recipe'),
+        )
+
+    def test_shopping_cart_lookup(self):
+        index_name = unique_index_name(
+            ShoppingCart, 'unique_shoppingcart_client_recipe'
+        )
+        self.assert_uses_index(
+            ShoppingCart.objects.filter(client_id=1, recipe_id=1), index_name
+        )
+        # пакетное добавление проверяет, что уже лежит в корзине
+        self.assert_uses_index(
+            ShoppingCart.objects.filter(
+                client_id=1, recipe_id__in=(1, 2, 3)
+            ).values_list('recipe_id', flat=True),
+            index_name,
+        )
+
+    def test_subscription_lookup(self):
+        self.assert_uses_index(
+            Subscription.objects.filter(follower_id=1, author_id=1),
+            unique_index_name(
+                Subscription, 'unique_subscription_follower_author'
+            ),
+        )
+
+    def test_user_relation_ids(self):
+        # наборы для is_favorited, is_in_shopping_cart и is_subscribed
+        constraints = {
+            Favorite: 'unique_favorite_follower_recipe',
+            ShoppingCart: 'unique_shoppingcart_client_recipe',
+            Subscription: 'unique_subscription_follower_author',
+        }
+        for model, user_field, id_field in RELATIONS.values():
+            with self.subTest(model=model.__name__):
+                self.assert_uses_index(
+                    model.objects.filter(**{user_field: 1})
+                    .order_by(id_field)
+                    .values_list(id_field, flat=True)
+                    .distinct(),
+                    unique_index_name(model, constraints[model]),
+                )
+
+    def test_recipe_list_order(self):
+        self.assert_uses_index(
+            Recipe.objects.order_by('-pub_date', '-id')[:10],
+            'recipe_pub_date_id_idx',
+        )
+
+    def test_feed_page(self):
+        self.assert_uses_index(
+            FeedEntry.objects.filter(follower_id=1).order_by(
+                '-pub_date', '-recipe_id'
+            )[:10],
+            'feedentry_follower_date_idx',
+        )
+
+
+class DuplicateRelationsTest(TestCase):
+    """Повторная связь отсекается уникальным индексом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                email=f'{username}@test.ru',
+                username=username,
+                first_name='Имя',
+                last_name='Фамилия',
+                password=f'{username}-password',
+            )
+            for username in ('user', 'author')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Суп', text='Сварить.', cooking_time=30
+        )
+        cls.tag = Tag.objects.create(name='Обед', slug='lunch')
+        cls.ingredient = Ingredient.objects.create(
+            name='Картофель', measurement_unit='г'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def assert_duplicate_rejected(self, model, **fields):
+        model.objects.create(**fields)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            model.objects.create(**fields)
+        self.assertEqual(model.objects.filter(**fields).count(), 1)
+
+    def test_favorite(self):
+        self.assert_duplicate_rejected(
+            Favorite, follower=self.user, recipe=self.recipe
+        )
+
+    def test_shopping_cart(self):
+        self.assert_duplicate_rejected(
+            ShoppingCart, client=self.user, recipe=self.recipe
+        )
+
+    def test_subscription(self):
+        self.assert_duplicate_rejected(
+            Subscription, follower=self.user, author=self.author
+        )
+
+    def test_recipe_tag(self):
+        self.assert_duplicate_rejected(
+            RecipeTag, recipe=self.recipe, tag=self.tag
+        )
+
+    def test_recipe_ingredient(self):
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=100
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.ingredient, amount=200
+            )
+
+    def assert_repeated_post_rejected(self, url, model, **fields):
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(model.objects.filter(**fields).count(), 1)
+
+    def test_repeated_favorite_request(self):
+        self.assert_repeated_post_rejected(
+            f'/api/recipes/{self.recipe.pk}/favorite/',
+            Favorite,
+            follower=self.user,
+        )
+
+    def test_repeated_shopping_cart_request(self):
+        self.assert_repeated_post_rejected(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/',
+            ShoppingCart,
+            client=self.user,
+        )
+
+    def test_repeated_subscribe_request(self):
+        self.assert_repeated_post_rejected(
+            f'/api/users/{self.author.pk}/subscribe/',
+            Subscription,
+            follower=self.user,
+        )
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+
+class BackfillCreatedMigrationTest(TransactionTestCase):
+    """0016 проставляет дату добавления и связям без рецепта."""
+
+    before = [('recipes', '0015_feedentry')]
+    after = [('recipes', '0016_recipe_ranking')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        # схема - как у остальных тестов
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_favorite_without_recipe(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model('users', 'User')
+        Recipe = apps.get_model('recipes', 'Recipe')
+        Favorite = apps.get_model('recipes', 'Favorite')
+        user = User.objects.create(
+            email='cook@test.ru',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестов',
+            password='cook-password',
+        )
+        published = timezone.now() - timedelta(days=30)
+        recipe = Recipe.objects.create(
+            author=user, name='Суп', text='Сварить.', cooking_time=30
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(pub_date=published)
+        Favorite.objects.create(follower=user, recipe=recipe)
+        Favorite.objects.create(follower=user, recipe=None)
+
+        started = timezone.now()
+        apps = self.migrate(self.after)
+        Favorite = apps.get_model('recipes', 'Favorite')
+        self.assertEqual(
+            Favorite.objects.get(recipe__isnull=False).created, published
+        )
+        self.assertGreaterEqual(
+            Favorite.objects.get(recipe__isnull=True).created, started
+        )
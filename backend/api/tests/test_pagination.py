@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.loaders import explicit_dates
+from recipes.models import Recipe
+from users.models import User
+
+
+class RecipeCursorPaginationTest(TestCase):
+    """Курсор по (pub_date, id): рецепты с одной датой не теряются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@test.ru',
+            username='author',
+            first_name='Автор',
+            last_name='Тестов',
+            password='author-password',
+        )
+        now = timezone.now()
+        # по четыре рецепта на каждую из трёх дат
+        with explicit_dates(Recipe, 'pub_date'):
+            for number in range(12):
+                Recipe.objects.create(
+                    author=author,
+                    name=f'Рецепт {number}',
+                    text='Смешать.',
+                    cooking_time=5,
+                    pub_date=now - timedelta(days=number % 3),
+                )
+        cls.expected = list(
+            Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def page_ids(self, data):
+        return [recipe['id'] for recipe in data['results']]
+
+    def test_forward_and_back(self):
+        pages = []
+        data = self.get('/api/recipes/?cursor=&limit=5')
+        self.assertIsNone(data['previous'])
+        while True:
+            pages.append(self.page_ids(data))
+            if data['next'] is None:
+                break
+            data = self.get(data['next'])
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+
+        # назад с последней страницы - те же страницы в обратном порядке
+        back = []
+        while data['previous'] is not None:
+            data = self.get(data['previous'])
+            back.append(self.page_ids(data))
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_search_falls_back_to_pages(self):
+        # курсор идёт по дате и потерял бы порядок по релевантности
+        data = self.get('/api/recipes/?cursor=&search=Рецепт&limit=5')
+        self.assertEqual(data['count'], 12)
+        self.assertEqual(len(data['results']), 5)
@@ -0,0 +1,187 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.counters import recount_all
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    Tag,
+)
+from users.models import Subscription, User
+
+
+class ListQueriesTest(TestCase):
+    """Число SQL-запросов списков не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            email='viewer@test.ru',
+            username='viewer',
+            first_name='Зритель',
+            last_name='Тестов',
+            password='viewer-password',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@test.ru',
+                username=f'author{number}',
+                first_name='Автор',
+                last_name='Тестов',
+                password='author-password',
+            )
+            for number in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.authors[number % 3],
+                name=f'Рецепт {number}',
+                text='Смешать.',
+                cooking_time=5,
+            )
+            for number in range(120)
+        )
+        recipes = list(Recipe.objects.all())
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in tags[:2]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for recipe in recipes
+            for ingredient in ingredients[:3]
+        )
+        Subscription.objects.bulk_create(
+            Subscription(follower=cls.viewer, author=author)
+            for author in cls.authors
+        )
+        # bulk_create не шлёт сигналы, счётчики пересчитываем сами
+        recount_all()
+
+    def setUp(self):
+        self.client = APIClient()
+        token = Token.objects.create(user=self.viewer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def clear_caches(self):
+        # версии таблиц, наборы id пользователя и токены лежат в кэшах
+        for alias in ('default', 'auth'):
+            caches[alias].clear()
+
+    def count_queries(self, url):
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_same_queries(self, small_url, large_url):
+        expected = self.count_queries(small_url)
+        self.clear_caches()
+        with self.assertNumQueries(expected):
+            response = self.client.get(large_url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recipe_list(self):
+        response = self.assert_same_queries(
+            '/api/recipes/?limit=5', '/api/recipes/?limit=100'
+        )
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_recipe_list_anonymous(self):
+        self.client.credentials()
+        self.assert_same_queries(
+            '/api/recipes/?limit=5', '/api/recipes/?limit=100'
+        )
+
+    def test_subscription_recipes_limit(self):
+        response = self.assert_same_queries(
+            '/api/users/subscriptions/?recipes_limit=5',
+            '/api/users/subscriptions/?recipes_limit=100',
+        )
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), 40)
+
+        # у каждого автора 40 рецептов, во вложенном списке - первые 5
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=5'
+        )
+        self.assertEqual(len(response.data['results']), 3)
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), 5)
+            self.assertEqual(author['recipes_count'], 40)
+
+
+class RecipeCreateQueriesTest(TestCase):
+    """Создание рецепта: число запросов не зависит от числа ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='cook@test.ru',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестов',
+            password='cook-password',
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(50)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        token = Token.objects.create(user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def payload(self, ingredients_count):
+        return {
+            'name': f'Рецепт из {ingredients_count}',
+            'text': 'Смешать.',
+            'cooking_time': 10,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 10}
+                for ingredient in self.ingredients[:ingredients_count]
+            ],
+        }
+
+    def create(self, ingredients_count):
+        for alias in ('default', 'auth'):
+            caches[alias].clear()
+        response = self.client.post(
+            '/api/recipes/', self.payload(ingredients_count), format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response
+
+    def test_create_with_many_ingredients(self):
+        with CaptureQueriesContext(connection) as context:
+            self.create(1)
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.create(50)
+        self.assertEqual(len(response.data['ingredients']), 50)
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.loaders import explicit_dates
+from recipes.models import Recipe, RecipeRanking
+from users.models import User
+
+
+class PopularOrderingTest(TestCase):
+    """?ordering=popular: сначала по местам, потом хвост по дате."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, other = (
+            User.objects.create_user(
+                email=f'{username}@test.ru',
+                username=username,
+                first_name='Автор',
+                last_name='Тестов',
+                password=f'{username}-password',
+            )
+            for username in ('author', 'other')
+        )
+        now = timezone.now()
+        with explicit_dates(Recipe, 'pub_date'):
+            recipes = [
+                Recipe.objects.create(
+                    author=cls.author if number % 3 else other,
+                    name=f'Рецепт {number}',
+                    text='Смешать.',
+                    cooking_time=5,
+                    pub_date=now - timedelta(days=number),
+                )
+                for number in range(8)
+            ]
+        # места у четырёх рецептов, у одного - только в трендах
+        for position, number in enumerate((5, 2, 7, 1), start=1):
+            RecipeRanking.objects.create(
+                recipe=recipes[number],
+                popular_score=10 - position,
+                trending_score=0,
+                popular_position=position,
+                computed_at=now,
+            )
+        RecipeRanking.objects.create(
+            recipe=recipes[3],
+            popular_score=0,
+            trending_score=1,
+            trending_position=1,
+            computed_at=now,
+        )
+        # новые сверху: 0, 3, 4, 6
+        cls.expected = [
+            recipes[number].pk for number in (5, 2, 7, 1, 0, 3, 4, 6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def walk(self, query, limit):
+        ids = []
+        url = f'/api/recipes/?ordering=popular&limit={limit}&{query}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids += [recipe['id'] for recipe in data['results']]
+            url = data['next']
+        self.assertEqual(data['count'], len(ids))
+        return ids
+
+    def test_pages(self):
+        for limit in (1, 3, 4, 5, 10):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk('', limit), self.expected)
+
+    def test_with_filter(self):
+        expected = [
+            pk
+            for pk in self.expected
+            if Recipe.objects.get(pk=pk).author_id == self.author.pk
+        ]
+        self.assertEqual(
+            self.walk(f'author={self.author.pk}', 2), expected
+        )
@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag,
+)
+from users.models import User
+
+
+class RecipeUpdateTest(TestCase):
+    """Правка рецепта удаляет лишние ингредиенты и теги."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@test.ru',
+            username='cook',
+            first_name='Повар',
+            last_name='Тестов',
+            password='cook-password',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Суп', text='Сварить.', cooking_time=30
+        )
+        cls.potato, cls.carrot, cls.onion = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Картофель', 'Морковь', 'Лук')
+        )
+        cls.lunch, cls.dinner = (
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Обед', 'lunch'), ('Ужин', 'dinner'))
+        )
+        for ingredient in (cls.potato, cls.carrot):
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=100
+            )
+        for tag in (cls.lunch, cls.dinner):
+            RecipeTag.objects.create(recipe=cls.recipe, tag=tag)
+        ShoppingCart.objects.create(client=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_stale_rows_deleted(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            {
+                'ingredients': [
+                    {'id': self.potato.pk, 'amount': 200},
+                    {'id': self.onion.pk, 'amount': 50},
+                ],
+                'tags': [self.lunch.pk],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(
+                self.recipe.recipeingredient_set.values_list(
+                    'ingredient__name', 'amount'
+                )
+            ),
+            {('Картофель', 200), ('Лук', 50)},
+        )
+        self.assertEqual(
+            list(self.recipe.recipetag_set.values_list('tag', flat=True)),
+            [self.lunch.pk],
+        )
+        # и из списка покупок удалённый ингредиент пропал
+        self.assertEqual(
+            set(
+                ShoppingListItem.objects.values_list(
+                    'ingredient__name', 'amount'
+                )
+            ),
+            {('Картофель', 200), ('Лук', 50)},
+        )
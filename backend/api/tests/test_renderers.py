@@ -0,0 +1,105 @@
+import datetime
+import uuid
+from decimal import Decimal
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+
+SAMPLES = (
+    None,
+    {},
+    [],
+    {'name': 'Борщ', 'amount': 300, 'ratio': 0.5, 'ok': True, 'x': None},
+    [{'id': 1, 'tags': ['завтрак', 'обед']}, {'id': 2, 'tags': []}],
+    {'text': 'строка и абзац', 'quote': '"\\/\t'},
+    {'emoji': '🍲', 'control': '\x00\x1f'},
+    {'big': 12345678901234567890123, 'negative': -2 ** 63},
+    {1: 'число в ключе', 'nested': {'deep': [[1.25, -0.0]]}},
+    # json пишет экспоненту со знаком и двумя цифрами, orjson - нет
+    {'large': 1e16, 'small': 1e-7, 'edge': float(2 ** 63), 'text': '1e5'},
+    [1e15, 1e-4, 123456789012345.6, 1.5e300, -2.5e-10],
+    {
+        'date': datetime.date(2026, 10, 18),
+        'time': datetime.time(12, 30, 15, 123456),
+        'moment': datetime.datetime(2026, 10, 18, 12, 30, 15, 123000),
+        'moment_utc': datetime.datetime(
+            2026, 10, 18, 12, 30, tzinfo=datetime.timezone.utc
+        ),
+        'duration': datetime.timedelta(hours=1, seconds=5),
+        'decimal': Decimal('10.50'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Избранное'),
+    },
+)
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    """ORJSONRenderer отдаёт те же байты и ошибки, что и JSONRenderer."""
+
+    def assert_same_output(self, data, accepted_media_type=None):
+        self.assertEqual(
+            ORJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_same_bytes(self):
+        for data in SAMPLES:
+            with self.subTest(data=data):
+                self.assert_same_output(data)
+
+    def test_same_bytes_with_indent(self):
+        for data in SAMPLES:
+            with self.subTest(data=data):
+                self.assert_same_output(data, 'application/json; indent=2')
+
+    def test_non_finite_floats(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            for data in (value, {'a': [1, {'b': value}]}, (None, value)):
+                with self.subTest(data=data):
+                    with self.assertRaises(ValueError) as expected:
+                        JSONRenderer().render(data)
+                    with self.assertRaises(ValueError) as raised:
+                        ORJSONRenderer().render(data)
+                    self.assertEqual(
+                        str(raised.exception), str(expected.exception)
+                    )
+
+
+class ORJSONParserTest(SimpleTestCase):
+    """ORJSONParser разбирает тела так же, как JSONParser."""
+
+    def parse(self, parser, body):
+        return parser.parse(BytesIO(body), 'application/json', {})
+
+    def test_same_result(self):
+        bodies = (
+            b'{"name": "\xd0\x91\xd0\xbe\xd1\x80\xd1\x89", "amount": 300}',
+            b'[1, 2.5, -0.0, true, false, null, "\\u2028"]',
+            b'{"big": 12345678901234567890123}',
+            b'{"negative": -18446744073709551617}',
+            b'{"edge": 9223372036854775807}',
+            b'{"id": "1234567890123456789012"}',
+        )
+        for body in bodies:
+            with self.subTest(body=body):
+                result = self.parse(ORJSONParser(), body)
+                expected = self.parse(JSONParser(), body)
+                # repr различает 10 и 10.0
+                self.assertEqual(repr(result), repr(expected))
+
+    def test_big_integer_is_exact(self):
+        result = self.parse(ORJSONParser(), b'[12345678901234567890123]')
+        self.assertEqual(result, [12345678901234567890123])
+
+    def test_invalid_body(self):
+        for body in (b'{"a": }', b'[NaN]', b'', b'{"a": 1} tail'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError):
+                    self.parse(ORJSONParser(), body)
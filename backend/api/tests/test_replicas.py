@@ -0,0 +1,182 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from api.caching import cached_read
+from api.middleware import ReplicaRoutingMiddleware
+from api.renderers import ORJSONRenderer
+from api.replicas import (
+    ReplicaRouter,
+    fresh_reads,
+    pin_to_primary,
+    read_alias,
+    replica_health,
+    route_request,
+)
+from recipes.models import Recipe, Tag
+
+REPLICAS = ['replica1', 'replica2']
+
+
+class ReplicaSettingsMixin:
+    """Две реплики, обе только что проверены и живы."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        settings_override = override_settings(DATABASE_REPLICAS=REPLICAS)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        saved = dict(replica_health.checked)
+        self.addCleanup(replica_health.checked.update, saved)
+        self.addCleanup(replica_health.checked.clear)
+        for alias in REPLICAS:
+            replica_health.checked[alias] = (True, time.monotonic())
+
+    def use_alias(self, alias):
+        token = read_alias.set(alias)
+        self.addCleanup(read_alias.reset, token)
+
+
+class ReplicaRouterTest(ReplicaSettingsMixin, SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_reads_from_request_alias(self):
+        self.assertIsNone(self.router.db_for_read(Recipe))
+        self.use_alias('replica1')
+        self.assertEqual(self.router.db_for_read(Recipe), 'replica1')
+
+    def test_writes_to_primary(self):
+        self.use_alias('replica1')
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    def test_tokens_from_primary(self):
+        self.use_alias('replica1')
+        self.assertIsNone(self.router.db_for_read(Token))
+
+
+class ReplicaRouterTransactionTest(ReplicaSettingsMixin, TestCase):
+    def test_atomic_block_reads_from_primary(self):
+        # TestCase держит каждый тест в транзакции
+        self.use_alias('replica1')
+        self.assertIsNone(ReplicaRouter().db_for_read(Recipe))
+
+
+class RouteRequestTest(ReplicaSettingsMixin, SimpleTestCase):
+    factory = RequestFactory()
+
+    def request(self, method, path='/api/recipes/', token='first'):
+        headers = {}
+        if token is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Token {token}'
+        return self.factory.generic(method, path, **headers)
+
+    def test_safe_api_reads_go_to_replica(self):
+        for method in ('GET', 'HEAD', 'OPTIONS'):
+            with self.subTest(method=method):
+                self.assertIn(route_request(self.request(method)), REPLICAS)
+
+    def test_writes_and_other_paths_go_to_primary(self):
+        self.assertIsNone(route_request(self.request('POST')))
+        self.assertIsNone(route_request(self.request('DELETE')))
+        self.assertIsNone(route_request(self.request('GET', '/admin/')))
+
+    def test_no_replicas(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertIsNone(route_request(self.request('GET')))
+
+    def test_unhealthy_replica_skipped(self):
+        replica_health.mark_down('replica1')
+        for _ in range(20):
+            self.assertEqual(route_request(self.request('GET')), 'replica2')
+        replica_health.mark_down('replica2')
+        self.assertIsNone(route_request(self.request('GET')))
+
+    def test_read_your_writes(self):
+        pin_to_primary(self.request('POST'))
+        self.assertIsNone(route_request(self.request('GET')))
+        # закреплён только тот, кто писал
+        self.assertIn(
+            route_request(self.request('GET', token='second')), REPLICAS
+        )
+        self.assertIn(
+            route_request(self.request('GET', token=None)), REPLICAS
+        )
+
+    def test_reads_do_not_pin(self):
+        pin_to_primary(self.request('GET'))
+        self.assertIn(route_request(self.request('GET')), REPLICAS)
+
+    def test_pin_expires(self):
+        with override_settings(DB_REPLICA_PIN_SECONDS=1):
+            pin_to_primary(self.request('PATCH'))
+            self.assertIsNone(route_request(self.request('GET')))
+            time.sleep(1.1)
+        self.assertIn(route_request(self.request('GET')), REPLICAS)
+
+
+class ReplicaRoutingMiddlewareTest(ReplicaSettingsMixin, SimpleTestCase):
+    factory = RequestFactory()
+
+    def test_alias_during_request(self):
+        seen = []
+
+        def get_response(request):
+            seen.append(read_alias.get())
+            return Response()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        authorization = {'HTTP_AUTHORIZATION': 'Token first'}
+        middleware(self.factory.get('/api/recipes/', **authorization))
+        middleware(self.factory.post('/api/recipes/', **authorization))
+        middleware(self.factory.get('/api/recipes/', **authorization))
+        self.assertIn(seen[0], REPLICAS)
+        # запись и чтение сразу после неё - с основной базы
+        self.assertEqual(seen[1:], [None, None])
+        self.assertIsNone(read_alias.get())
+
+
+class FreshReadsTest(ReplicaSettingsMixin, SimpleTestCase):
+    def test_recent_change_reads_from_primary(self):
+        self.use_alias('replica1')
+        with fresh_reads(int(time.time())):
+            self.assertIsNone(read_alias.get())
+        self.assertEqual(read_alias.get(), 'replica1')
+
+    def test_old_change_reads_from_replica(self):
+        self.use_alias('replica1')
+        with fresh_reads(int(time.time()) - 3600):
+            self.assertEqual(read_alias.get(), 'replica1')
+
+    def test_cached_read_rebuilds_from_primary(self):
+        seen = []
+
+        class TagView:
+            cache_models = (Tag,)
+
+            @cached_read
+            def list(self, request):
+                seen.append(read_alias.get())
+                return Response([])
+
+        def get():
+            request = Request(RequestFactory().get('/api/tags/'))
+            request.accepted_renderer = ORJSONRenderer()
+            request.user = AnonymousUser()
+            return TagView().list(request)
+
+        self.use_alias('replica1')
+        # версии таблицы нет в кэше: она считается изменённой только что
+        get()
+        # час спустя та же версия уже дошла до реплик
+        later = time.time() + 3600
+        with mock.patch('api.replicas.time.time', return_value=later):
+            get()
+        self.assertEqual(seen, [None, 'replica1'])
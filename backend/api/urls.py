@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import urlpatterns as async_urlpatterns
 from api.views import (
     FavoriteViewSet,
     IngredientViewSet,
@@ -55,3 +57,7 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.ASYNC_READS:
+    # под ASGI эти вьюсеты работают в пуле потоков, см. api.async_views
+    urlpatterns = async_urlpatterns + urlpatterns
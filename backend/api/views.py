@@ -1,7 +1,9 @@
-import csv
-from collections import defaultdict
+from functools import partial
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, serializers, status, viewsets
@@ -10,14 +12,27 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
-from api.filters import RecipeFilter, IngredientFilter
+from api.caching import CachedReadMixin, cached_read
+from api.filters import ORDERING_POPULAR, RecipeFilter, tag_facets
+from api.pagination import (
+    FeedCursorPagination,
+    PageLimitPagination,
+    RecipeCursorPagination,
+)
 from api.permissions import IsOwnerOrReadOnly
+from api.renderers import (
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListTXTRenderer,
+)
 from api.serializers import (
     FavoriteSerializer,
     IngredientSerializer,
     RecipeCreateUpdateSerializer,
+    RecipeIdsSerializer,
     RecipeListSerializer,
     ShoppingCartSerializer,
+    ShoppingListItemSerializer,
     SubscriptionSerializer,
     TagSerializer,
     UserInSubscriptionSerializer,
@@ -28,13 +43,96 @@ from recipes.models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
+    RecipeRanking,
+    RecipeTag,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
-    RecipeTag,
 )
+from recipes.counters import recount
+from recipes.feed import feed_keys
+from recipes.ranking import PopularIds, trending_ids
+from recipes.relations import bump_relation_version, get_relation_ids
+from recipes.search import ingredient_index
+from recipes.shopping_list import recipe_ingredient_ids, refresh_shopping_lists
+from recipes.versions import bump_table_version
 from users.models import Subscription, User
 
 
+def save_unique(serializer, message, **kwargs):
+    """
+    Сохраняет связь, повтор превращает в ошибку валидации.
+
+    Дубли отсекает уникальный индекс в БД, а не проверка перед
+    записью: два одновременных запроса её проходят оба.
+    """
+    try:
+        with transaction.atomic():
+            serializer.save(**kwargs)
+    except IntegrityError:
+        raise serializers.ValidationError(message)
+
+
+def delete_or_fail(queryset, message):
+    """Удаляет записи одним запросом, если удалять нечего - ошибка."""
+    deleted, _ = queryset.delete()
+    if not deleted:
+        raise serializers.ValidationError(message)
+
+
+def batch_relation(request, model, user_field, relation):
+    """
+    Пакетно добавляет (POST) или удаляет (DELETE) рецепты из связи.
+
+    Id проверяются одним запросом, вставка - один bulk_create с
+    ignore_conflicts, удаление - обычный delete() с сигналами. Для
+    каждого id возвращается статус: created, exists, deleted, absent,
+    not_found.
+    """
+    serializer = RecipeIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    user = request.user
+
+    with transaction.atomic():
+        found = set(
+            Recipe.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        linked = model.objects.filter(
+            **{user_field: user}, recipe_id__in=found
+        )
+        present = set(linked.values_list('recipe_id', flat=True))
+        if request.method == 'POST':
+            model.objects.bulk_create(
+                (
+                    model(**{user_field: user}, recipe_id=recipe_id)
+                    for recipe_id in found - present
+                ),
+                ignore_conflicts=True,
+            )
+            # bulk_create не шлёт сигналы
+            recount(model, found)
+            if model is ShoppingCart:
+                refresh_shopping_lists(
+                    [user.pk], recipe_ingredient_ids(found)
+                )
+            statuses = ('exists', 'created')
+        else:
+            # счётчики и список покупок сдвигают сигналы post_delete
+            linked.delete()
+            statuses = ('deleted', 'absent')
+    bump_relation_version(relation, user.pk)
+
+    results = []
+    for recipe_id in ids:
+        if recipe_id not in found:
+            result = 'not_found'
+        else:
+            result = statuses[recipe_id not in present]
+        results.append({'id': recipe_id, 'status': result})
+    return Response({'results': results})
+
+
 class MeViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     """Костыль против ошибки при обращении анонима к эндпоинту /me"""
 
@@ -51,16 +149,18 @@ class MeViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
             'request': self.request,
             'format': self.format_kwarg,
             'view': self,
-            'subscriptions': set(
-                Subscription.objects.filter(
-                    follower_id=self.request.user
-                ).values_list('author_id', flat=True)
-            )
+            'subscriptions': get_relation_ids(
+                'subscriptions', self.request.user.pk
+            ),
         }
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(CachedReadMixin, ModelViewSet):
     queryset = Recipe.objects.all()
+    cache_models = (
+        Recipe, RecipeIngredient, RecipeTag, Tag, Ingredient, User,
+        RecipeRanking,
+    )
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = (IsOwnerOrReadOnly,)
 
@@ -75,6 +175,102 @@ class RecipeViewSet(ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        # ингредиенты и теги пишутся через bulk_create, без сигналов
+        bump_table_version(Recipe)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['tag_facets'] = tag_facets(
+            self.request.query_params, self.get_queryset(), self.request
+        )
+        return response
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite',
+    )
+    def favorite_batch(self, request):
+        return batch_relation(request, Favorite, 'follower', 'favorites')
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart',
+    )
+    def shopping_cart_batch(self, request):
+        return batch_relation(
+            request, ShoppingCart, 'client', 'shopping_cart'
+        )
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        pagination_class=None,
+        url_path='shopping_list',
+    )
+    def shopping_list(self, request):
+        """Текущий список покупок: ингредиенты с суммарным количеством."""
+        items = (
+            ShoppingListItem.objects.filter(client=request.user)
+            .select_related('ingredient')
+            .order_by('ingredient__name', 'ingredient_id')
+        )
+        return Response(ShoppingListItemSerializer(items, many=True).data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        url_path='feed',
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок пользователя, новые сверху."""
+        paginator = FeedCursorPagination()
+        ids = paginator.paginate_feed(
+            request, partial(feed_keys, request.user.pk)
+        )
+        recipes = self.get_queryset().in_bulk(ids)
+        # рецепт могли удалить между выборкой ключей и рецептов
+        page = [recipes[pk] for pk in ids if pk in recipes]
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=('get',), url_path='trending')
+    @cached_read
+    def trending(self, request):
+        """Рецепты, которые чаще всего добавляют сейчас, по местам."""
+        paginator = PageLimitPagination()
+        ids = paginator.paginate_queryset(trending_ids(), request, view=self)
+        recipes = self.get_queryset().in_bulk(ids)
+        page = [recipes[pk] for pk in ids if pk in recipes]
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def paginate_queryset(self, queryset):
+        if self.request.query_params.get('ordering') != ORDERING_POPULAR:
+            return super().paginate_queryset(queryset)
+        # места посчитаны заранее, см. recipes.ranking
+        ids = super().paginate_queryset(PopularIds(queryset))
+        recipes = queryset.in_bulk(ids)
+        return [recipes[pk] for pk in ids if pk in recipes]
+
+    @property
+    def paginator(self):
+        # старые клиенты ходят с page/limit, курсор включается явно;
+        # курсор идёт по дате и не сохранит ни рейтинговый порядок,
+        # ни порядок по релевантности из ?search=
+        params = self.request.query_params
+        if (
+            'cursor' in params
+            and 'search' not in params
+            and params.get('ordering') != ORDERING_POPULAR
+        ):
+            self.pagination_class = RecipeCursorPagination
+        return super().paginator
 
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'partial_update'):
@@ -88,39 +284,21 @@ class RecipeViewSet(ModelViewSet):
                 'request': self.request,
                 'format': self.format_kwarg,
                 'view': self,
-                'recipe-tag':
-                    RecipeTag.objects.filter(
-                        recipe_id=self.kwargs.get('pk')
-                    ).all(),
-                'recipe-ingredient':
-                    RecipeIngredient.objects.filter(
-                        recipe_id=self.kwargs.get('pk')
-                    ).all(),
-                'is_favorited':
-                    set(
-                        Favorite.objects.filter(
-                            follower_id=self.request.user
-                        ).values_list('recipe_id', flat=True)
-                    ),
-                'is_in_shopping_cart':
-                    set(
-                        ShoppingCart.objects.filter(
-                            client_id=self.request.user
-                        ).values_list('recipe_id', flat=True)
-                    ),
+                'subscriptions': get_relation_ids(
+                    'subscriptions', self.request.user.pk
+                ),
+                'is_favorited': get_relation_ids(
+                    'favorites', self.request.user.pk
+                ),
+                'is_in_shopping_cart': get_relation_ids(
+                    'shopping_cart', self.request.user.pk
+                ),
             }
         return {
             'request': self.request,
             'format': self.format_kwarg,
             'view': self,
-            'recipe-tag':
-                RecipeTag.objects.filter(
-                    recipe_id=self.kwargs.get('pk')
-                ).all(),
-            'recipe-ingredient':
-                RecipeIngredient.objects.filter(
-                    recipe_id=self.kwargs.get('pk')
-                ).all(),
+            'subscriptions': set(),
             'is_favorited': False,
             'is_in_shopping_cart': False,
         }
@@ -128,7 +306,7 @@ class RecipeViewSet(ModelViewSet):
     def get_queryset(self):
         new_queryset = Recipe.objects.add_user_annotations(
             self.request.user.pk
-        )
+        ).with_related()
 
         # Фильтры из GET-параметров запроса, например.
         author = self.request.query_params.get('author', None)
@@ -142,56 +320,46 @@ class RecipeViewSet(ModelViewSet):
         methods=('get',),
         permission_classes=(IsAuthenticated,),
         serializer_class=None,
+        renderer_classes=(
+            ShoppingListCSVRenderer,
+            ShoppingListTXTRenderer,
+            ShoppingListJSONRenderer,
+        ),
         url_path='',
     )
     def download_shopping_cart(self, request):
         client = self.request.user
-        shopping_cart_objects = ShoppingCart.objects.filter(
-            client=client
-        ).all()
-        shopping_list = defaultdict()
 
-        if len(shopping_cart_objects) < 1:
+        if not ShoppingCart.objects.filter(client=client).exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__in_shopping_list__client_id=client
-        ).values_list(
-            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        # суммы по ингредиентам ведёт recipes.shopping_list при записи;
+        # одинаковые названия с разными единицами - разные строки.
+        # Строк не больше, чем ингредиентов, и читаются они здесь:
+        # под ASGI ответ перебирается в цикле событий, где ленивый
+        # queryset упал бы с SynchronousOnlyOperation
+        rows = list(
+            ShoppingListItem.objects.filter(client=client)
+            .order_by('ingredient__name', 'ingredient_id')
+            .values_list(
+                'ingredient__name', 'ingredient__measurement_unit', 'amount'
+            )
         )
 
-        for name, unit, amount in ingredients:
-            if name not in shopping_list.keys():
-                shopping_list[name] = {
-                    'measurement_unit': unit,
-                    'amount': amount,
-                }
-            else:
-                shopping_list[name]['amount'] += amount
-
-        response = HttpResponse(
-            content_type='text/csv',
-            headers={
-                'Content-Disposition':
-                    'attachment; filename="shopping_list.csv"'
-            },
+        # формат выбирается через ?format=csv|txt|json или Accept
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
-
-        writer = csv.writer(response)
-
-        array_of_rows = list()
-
-        for name, vals in shopping_list.items():
-            array_of_rows.append(
-                (name, vals['measurement_unit'], vals['amount'])
-            )
-        for row in array_of_rows:
-            writer.writerow(row)
-
         return response
 
 
 class IngredientViewSet(
+    CachedReadMixin,
     ModelViewSet,
 ):
     http_method_names = ['get']
@@ -199,15 +367,27 @@ class IngredientViewSet(
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+    cache_models = (Ingredient,)
+
+    @cached_read
+    def list(self, request, *args, **kwargs):
+        # поиск по началу названия идёт по индексу в памяти, без БД
+        name = request.query_params.get('name', '')
+        return Response(
+            ingredient_index.search(
+                name, settings.INGREDIENT_SEARCH_LIMIT
+            )
+        )
 
 
 class TagViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    CachedReadMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     queryset = Tag.objects.all()
+    cache_models = (Tag,)
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
@@ -222,16 +402,23 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
             return UserInSubscriptionSerializer
         return SubscriptionSerializer
 
+    def get_recipes_limit(self):
+        """Значение ?recipes_limit=, если это положительное число."""
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return recipes_limit if recipes_limit > 0 else None
+
     def get_serializer_context(self):
         return {
             'request': self.request,
             'format': self.format_kwarg,
             'view': self,
-            'subscriptions': set(
-                Subscription.objects.filter(
-                    follower_id=self.request.user
-                ).values_list('author_id', flat=True)
+            'subscriptions': get_relation_ids(
+                'subscriptions', self.request.user.pk
             ),
+            'recipes_limit': self.get_recipes_limit(),
         }
 
     def get_queryset(self):
@@ -242,32 +429,45 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
             .values_list('author_id', flat=True)
             .order_by('id')
         )
-        # см. документацию по Field lookups из object.filter
-        new_queryset = User.objects.filter(id__in=author_id_queryset)
-        return new_queryset
 
-    def perform_create(self, serializer):
-        author_id = self.kwargs.get('user_id')
-        # проверка, что такого Subscription уже нет в БД
-        queryset = Subscription.objects.filter(
-            follower=self.request.user, author_id=author_id
-        )
+        recipes = Recipe.objects.order_by('-pub_date', '-id')
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit:
+            # первые N рецептов каждого автора одним запросом:
+            # коррелированный подзапрос с LIMIT внутри IN
+            recipes = recipes.filter(
+                id__in=Subquery(
+                    Recipe.objects.filter(author_id=OuterRef('author_id'))
+                    .order_by('-pub_date', '-id')
+                    .values('id')[:recipes_limit]
+                )
+            )
 
-        if len(queryset) > 0:
-            raise serializers.ValidationError(
-                'Вы уже подписаны на этого автора!'
+        # см. документацию по Field lookups из object.filter
+        new_queryset = (
+            User.objects.filter(id__in=author_id_queryset)
+            .prefetch_related(
+                Prefetch(
+                    'recipes',
+                    queryset=recipes.only(
+                        'id', 'author_id', 'name', 'image', 'cooking_time'
+                    ),
+                )
             )
+        )
+        return new_queryset
 
-        if User.objects.get(id=author_id) == self.request.user:
+    def perform_create(self, serializer):
+        author = get_object_or_404(User, id=self.kwargs.get('user_id'))
+        if author == self.request.user:
             raise serializers.ValidationError('Нельзя подписываться на себя!')
 
-        author_obj = User.objects.get(id=author_id)
-        print(author_obj)
-
         # запись нового объекта Subscription (new!)
-        serializer.save(
+        save_unique(
+            serializer,
+            'Вы уже подписаны на этого автора!',
             follower=self.request.user,
-            author_id=author_id,
+            author=author,
         )
 
         return Response(status=status.HTTP_201_CREATED)
@@ -281,19 +481,12 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     )
     def delete(self, request, *args, **kwargs):
         author_id = self.kwargs.get('user_id')
-
-        # проверка, что такая Subscription существует в БД
-        queryset = Subscription.objects.filter(
-            follower=self.request.user, author_id=author_id
+        delete_or_fail(
+            Subscription.objects.filter(
+                follower=self.request.user, author_id=author_id
+            ),
+            'Вы не подписаны на этого автора!',
         )
-        if len(queryset) == 0:
-            raise serializers.ValidationError(
-                'Вы не подписаны на этого автора!'
-            )
-
-        Subscription.objects.filter(
-            follower=self.request.user, author_id=author_id
-        ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -318,34 +511,25 @@ class FavoriteViewSet(viewsets.ModelViewSet):
         # стандартный viewset разрешает метод delete только на something/id/
         # поэтому если /something/something_else/, придётся @action писать
         recipe_id = self.kwargs.get('recipe_id')
-
-        # проверка, что такой Favorite существует в БД
-        queryset = Favorite.objects.filter(
-            follower=self.request.user, recipe=recipe_id
+        delete_or_fail(
+            Favorite.objects.filter(
+                follower=self.request.user, recipe=recipe_id
+            ),
+            'Этот рецепт отсутствует в Избранном!',
         )
-        if len(queryset) == 0:
-            raise serializers.ValidationError(
-                'Этот рецепт отсутствует в Избранном!'
-            )
-
-        Favorite.objects.filter(recipe=recipe_id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def perform_create(self, serializer):
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
 
-        # проверка, что такого Favorite уже нет в БД
-        queryset = Favorite.objects.filter(
-            follower=self.request.user, recipe=recipe_id
-        )
-        if len(queryset) > 0:
-            raise serializers.ValidationError(
-                'Этот рецепт уже есть в Избранном!'
-            )
-
         # запись нового объекта Favorite
-        serializer.save(follower=self.request.user, recipe=recipe)
+        save_unique(
+            serializer,
+            'Этот рецепт уже есть в Избранном!',
+            follower=self.request.user,
+            recipe=recipe,
+        )
 
         return Response(status=status.HTTP_201_CREATED)
 
@@ -373,19 +557,12 @@ class ShoppingCartViewSet(
     )
     def delete(self, request, *args, **kwargs):
         recipe_id = self.kwargs.get('recipe_id')
-
-        # проверка, что такой ShoppingCart существует в БД
-        queryset = ShoppingCart.objects.filter(
-            client=self.request.user, recipe=recipe_id
+        delete_or_fail(
+            ShoppingCart.objects.filter(
+                client=self.request.user, recipe=recipe_id
+            ),
+            'Этот рецепт отсутствует в списке покупок!',
         )
-        if len(queryset) == 0:
-            raise serializers.ValidationError(
-                'Этот рецепт отсутствует в списке покупок!'
-            )
-
-        ShoppingCart.objects.filter(
-            client=self.request.user, recipe=recipe_id
-        ).delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -393,17 +570,10 @@ class ShoppingCartViewSet(
         recipe_id = self.kwargs.get('recipe_id')
         recipe = get_object_or_404(Recipe, id=recipe_id)
 
-        # проверка, что такого ShoppingCart уже нет в БД
-        queryset = ShoppingCart.objects.filter(
-            client=self.request.user, recipe=recipe_id
-        )
-        if len(queryset) > 0:
-            raise serializers.ValidationError(
-                'Этот рецепт уже есть в списке покупок!'
-            )
-
         # запись нового объекта ShoppingCart
-        serializer.save(
+        save_unique(
+            serializer,
+            'Этот рецепт уже есть в списке покупок!',
             client=self.request.user,
             recipe=recipe,
         )
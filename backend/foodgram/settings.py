@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 
 load_dotenv()
@@ -70,6 +71,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.QueryTimingMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
 
     'django.middleware.common.CommonMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,9 +127,89 @@ else:
         }
     }
 
+# Реплики только для чтения (api.replicas): хосты копий PostgreSQL через
+# запятую, а для локальной проверки на SQLite - пути к файлам баз.
+# В тестах реплики смотрят в тестовую базу default
+_replica_key = (
+    'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') else 'HOST'
+)
+for _number, _location in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', default='').split(',')), start=1
+):
+    DATABASES[f'replica{_number}'] = {
+        **DATABASES['default'],
+        _replica_key: _location.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# Сколько секунд после записи клиент читает с основной базы
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', default=10))
+# Как часто проверять реплики и какое отставание в секундах допустимо
+DB_REPLICA_CHECK_INTERVAL = int(
+    os.getenv('DB_REPLICA_CHECK_INTERVAL', default=10)
+)
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', default=5))
+
+# Токен -> пользователь для api.authentication: записи с TTL, в
+# локальной памяти - не больше AUTH_CACHE_SIZE. При нескольких
+# процессах кэш общий (см. CACHES), иначе выход из системы не дойдёт
+# до соседей
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', default=300))
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', default=10000))
+# Раз в столько проверок токена доля попаданий пишется в лог
+AUTH_CACHE_LOG_EVERY = int(os.getenv('AUTH_CACHE_LOG_EVERY', default=1000))
+
+# Версии таблиц и связей, ETag, готовые ответы, закреплённые за
+# основной базой клиенты и токены должны быть общими для всех
+# воркеров: иначе каждый процесс видит свои версии, отдаёт устаревшие
+# ответы и не узнаёт об изменениях в соседях. Поэтому при
+# WEB_CONCURRENCY > 1 (его же читают gunicorn и uvicorn) обязателен
+# общий Memcached: CACHE_LOCATION=memcached:11211[,host:port...].
+# Локальная память процесса годится только для одного воркера
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', default=1))
+CACHE_LOCATION = [
+    location
+    for location in os.getenv('CACHE_LOCATION', default='').split(',')
+    if location
+]
+
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_LOCATION,
+        },
+        'auth': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': CACHE_LOCATION,
+            'KEY_PREFIX': 'auth',
+            'TIMEOUT': AUTH_CACHE_TTL,
+        },
+    }
+elif WEB_CONCURRENCY > 1:
+    raise ImproperlyConfigured(
+        'WEB_CONCURRENCY > 1 требует общего кэша: задайте CACHE_LOCATION'
+    )
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'auth': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'auth',
+            'TIMEOUT': AUTH_CACHE_TTL,
+            'OPTIONS': {'MAX_ENTRIES': AUTH_CACHE_SIZE},
+        },
+    }
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Потоки, в которых картинки рецептов ужимаются вне запроса
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -178,12 +261,64 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    # JSON тот же, что у стандартных классов, но через orjson;
+    # MessagePack - по Accept или Content-Type application/msgpack
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
     'PAGE_SIZE': 5,
 }
 
+# Вьюсеты рецептов, тегов и ингредиентов в пуле потоков
+# (api.async_views), включает asgi.py
+ASYNC_READS = os.getenv('ASYNC_READS', default='0') == '1'
+
+# Сколько ингредиентов отдаёт поиск по началу названия
+INGREDIENT_SEARCH_LIMIT = 20
+
+# Авторы с большим числом подписчиков популярны: их рецепты не
+# раскладываются по лентам при публикации, лента добирает их при чтении
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+
+# Рейтинги рецептов (recipes.ranking): вклад добавления в избранное или
+# корзину вдвое слабеет за столько часов
+RANKING_POPULAR_HALF_LIFE = float(
+    os.getenv('RANKING_POPULAR_HALF_LIFE', default=24 * 30)
+)
+RANKING_TRENDING_HALF_LIFE = float(
+    os.getenv('RANKING_TRENDING_HALF_LIFE', default=24)
+)
+# Сколько мест в каждом рейтинге
+RANKING_SIZE = int(os.getenv('RANKING_SIZE', default=10000))
+
+# Доля запросов к /api/ с заголовками Server-Timing и X-Query-Count:
+# 0 - выключено, 1 - все запросы
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', default=0.01)
+)
+# Замеренные запросы дольше стольких миллисекунд или с таким числом
+# SQL-запросов попадают в лог api.middleware
+REQUEST_METRICS_SLOW_MS = int(
+    os.getenv('REQUEST_METRICS_SLOW_MS', default=500)
+)
+REQUEST_METRICS_MAX_QUERIES = int(
+    os.getenv('REQUEST_METRICS_MAX_QUERIES', default=30)
+)
+
+# Сколько секунд анонимные ответы на чтение живут в кэше Django и nginx
+API_CACHE_MAX_AGE = 60
+
 DJOSER = {
     'HIDE_USERS': False,  
     'PERMISSIONS': {
@@ -1,14 +1,23 @@
+import traceback
+from itertools import chain
+
 from django.contrib import admin
+from django.db import transaction
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
+from import_export.results import RowResult
 
+from .loaders import load_ingredients
 from .models import (
     Favorite,
+    FeedEntry,
     Ingredient,
     Recipe,
     RecipeIngredient,
+    RecipeRanking,
     RecipeTag,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
 )
 
@@ -31,8 +40,52 @@ class TagAdmin(admin.ModelAdmin):
     )
 
 
+class IngredientResource(resources.ModelResource):
+
+    class Meta:
+        model = Ingredient
+
+    def import_data(
+        self, dataset, dry_run=False, raise_errors=False, **kwargs
+    ):
+        """Импорт пачками через load_ingredients вместо построчного."""
+        result = self.get_result_class()()
+        result.diff_headers = self.get_diff_headers()
+        result.total_rows = len(dataset)
+        if {'name', 'measurement_unit'} <= set(dataset.headers or ()):
+            rows = (
+                (row['name'], row['measurement_unit'])
+                for row in dataset.dict
+            )
+        else:
+            # файл без заголовка, как data/ingredients.csv
+            rows = chain(
+                [dataset.headers[:2]], (row[:2] for row in dataset)
+            )
+            result.total_rows += 1
+
+        try:
+            with transaction.atomic():
+                _, created = load_ingredients(rows)
+                # предпросмотр: считаем добавленное и откатываем
+                transaction.set_rollback(dry_run)
+        except Exception as error:
+            result.append_base_error(
+                self.get_error_result_class()(error, traceback.format_exc())
+            )
+            if raise_errors:
+                raise
+            return result
+        result.totals[RowResult.IMPORT_TYPE_NEW] = created
+        result.totals[RowResult.IMPORT_TYPE_SKIP] = (
+            result.total_rows - created
+        )
+        return result
+
+
 @admin.register(Ingredient)
 class IngredientAdmin(ImportExportModelAdmin):
+    resource_class = IngredientResource
     list_display = (
         'id',
         'name',
@@ -42,28 +95,17 @@ class IngredientAdmin(ImportExportModelAdmin):
     list_filter = ('name',)
 
 
-class IngredientResource(resources.ModelResource):
-
-    class Meta:
-        model = Ingredient
-
-
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'id',
         'name',
         'author',
-        'fav_counter'
+        'favorites_count',
     )
     search_fields = ('id', 'name', 'author', 'tags')
     list_filter = ('name',)
 
-    def fav_counter(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
-
-    fav_counter.short_description = 'В избранном'
-
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -112,3 +154,39 @@ class ShoppingCartAdmin(admin.ModelAdmin):
         'client',
         'recipe',
     )
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'client',
+        'ingredient',
+        'amount',
+    )
+    search_fields = ('client__username', 'ingredient__name')
+
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'follower',
+        'recipe',
+        'author',
+        'pub_date',
+    )
+    search_fields = ('follower__username', 'author__username')
+
+
+@admin.register(RecipeRanking)
+class RecipeRankingAdmin(admin.ModelAdmin):
+    list_display = (
+        'recipe',
+        'popular_position',
+        'popular_score',
+        'trending_position',
+        'trending_score',
+        'computed_at',
+    )
+    search_fields = ('recipe__name',)
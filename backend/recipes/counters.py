@@ -0,0 +1,62 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# Модель связи -> [(модель со счётчиком, поле ссылки, поле счётчика)]
+COUNTERS = {
+    Favorite: [(Recipe, 'recipe_id', 'favorites_count')],
+    ShoppingCart: [(Recipe, 'recipe_id', 'in_carts_count')],
+    Recipe: [(User, 'author_id', 'recipes_count')],
+    Subscription: [(User, 'author_id', 'followers_count')],
+}
+
+
+def shift_counters(instance, delta):
+    """Сдвигает счётчики на delta одним UPDATE с F(), без гонок."""
+    for model, link, field in COUNTERS.get(type(instance), ()):
+        pk = getattr(instance, link)
+        if pk is None:
+            continue
+        model.objects.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def _count(relation_model, link):
+    return Coalesce(
+        Subquery(
+            relation_model.objects.filter(**{link: OuterRef('pk')})
+            .order_by()
+            .values(link)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def recount(relation_model, pks):
+    """
+    Пересчитывает счётчики связи у перечисленных объектов.
+
+    Для bulk-операций: сигналов нет, а с ignore_conflicts неизвестно,
+    сколько строк вставлено на самом деле.
+    """
+    for model, link, field in COUNTERS.get(relation_model, ()):
+        model.objects.filter(pk__in=pks).update(
+            **{field: _count(relation_model, link)}
+        )
+
+
+def recount_all():
+    """Пересчитывает все счётчики с нуля, по UPDATE на таблицу."""
+    Recipe.objects.update(
+        favorites_count=_count(Favorite, 'recipe'),
+        in_carts_count=_count(ShoppingCart, 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=_count(Recipe, 'author'),
+        followers_count=_count(Subscription, 'author'),
+    )
@@ -0,0 +1,177 @@
+from heapq import merge
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+
+def fan_out(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    follower_ids = Subscription.objects.filter(
+        author_id=recipe.author_id,
+        author__followers_count__lte=settings.FEED_FANOUT_LIMIT,
+    ).values_list('follower_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                follower_id=follower_id,
+                recipe_id=recipe.pk,
+                author_id=recipe.author_id,
+                pub_date=recipe.pub_date,
+            )
+            for follower_id in follower_ids.iterator()
+        ),
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+
+
+def refresh_timelines(follower_ids, author_ids=None):
+    """
+    Пересобирает ленты подписчиков по их подпискам.
+
+    Считаются заново только рецепты авторов из author_ids,
+    author_ids=None - вся лента. В БД пишется разница: недостающие
+    и лишние строки. Возвращает число записанных строк.
+    """
+    # точка сохранения не нужна: ошибка откатывает всю транзакцию
+    with transaction.atomic(savepoint=False):
+        entries = FeedEntry.objects.filter(follower_id__in=follower_ids)
+        sources = Recipe.objects.filter(
+            author__in_subscriptions__follower_id__in=follower_ids,
+            author__followers_count__lte=settings.FEED_FANOUT_LIMIT,
+        )
+        if author_ids is not None:
+            entries = entries.filter(author_id__in=author_ids)
+            sources = sources.filter(author_id__in=author_ids)
+
+        expected = {
+            (follower_id, recipe_id): (author_id, pub_date)
+            for follower_id, recipe_id, author_id, pub_date in (
+                sources.values_list(
+                    'author__in_subscriptions__follower_id',
+                    'id',
+                    'author_id',
+                    'pub_date',
+                ).order_by()
+            )
+        }
+        stale = []
+        for pk, follower_id, recipe_id in entries.values_list(
+            'pk', 'follower_id', 'recipe_id'
+        ):
+            if expected.pop((follower_id, recipe_id), None) is None:
+                stale.append(pk)
+
+        if stale:
+            # строки выбираются ради общих обработчиков post_delete
+            # (recipes.signals), для FeedEntry они ничего не делают
+            FeedEntry.objects.filter(pk__in=stale).delete()
+        # параллельная публикация могла уже вставить ту же строку
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(
+                    follower_id=follower_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for (follower_id, recipe_id), (author_id, pub_date) in (
+                    expected.items()
+                )
+            ),
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+    return len(stale) + len(expected)
+
+
+def refresh_subscription(follower_id, author_id):
+    """
+    Лента после подписки или отписки.
+
+    Если автор на пороге популярности, лента его рецептов
+    пересобирается у всех подписчиков: популярного автора из лент
+    убираем, а переставшего быть популярным раскладываем заново.
+    """
+    followers_count = (
+        User.objects.filter(pk=author_id)
+        .values_list('followers_count', flat=True)
+        .first()
+    )
+    follower_ids = [follower_id]
+    limit = settings.FEED_FANOUT_LIMIT
+    if followers_count in (limit, limit + 1):
+        follower_ids += list(
+            Subscription.objects.filter(author_id=author_id).values_list(
+                'follower_id', flat=True
+            )
+        )
+    refresh_timelines(follower_ids, [author_id])
+
+
+def all_followers():
+    """Id всех, у кого есть подписки или лента, по порядку."""
+    return sorted(
+        set(Subscription.objects.values_list('follower_id', flat=True))
+        | set(FeedEntry.objects.values_list('follower_id', flat=True))
+    )
+
+
+def after_key(queryset, id_field, key, reverse):
+    """Строки queryset строго после ключа (pub_date, id) по ходу ленты."""
+    pub_date, recipe_id = key
+    lookup, bound = ('gt', 'gte') if reverse else ('lt', 'lte')
+    # условие на одну pub_date даёт индексу границу диапазона
+    return queryset.filter(
+        Q(**{f'pub_date__{lookup}': pub_date})
+        | Q(pub_date=pub_date, **{f'{id_field}__{lookup}': recipe_id}),
+        **{f'pub_date__{bound}': pub_date},
+    )
+
+
+def feed_keys(follower_id, key, reverse, limit):
+    """
+    Ключи (pub_date, id) страницы ленты подписчика.
+
+    Сливает его ленту с рецептами популярных авторов из его подписок:
+    из каждого источника берётся не больше limit строк по индексу.
+    key - ключ, после которого начинается страница (None - с начала),
+    reverse - листать к более новым рецептам.
+    """
+    sources = [
+        (FeedEntry.objects.filter(follower_id=follower_id), 'recipe_id')
+    ]
+    popular = list(
+        Subscription.objects.filter(
+            follower_id=follower_id,
+            author__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list('author_id', flat=True)
+    )
+    if popular:
+        sources.append((Recipe.objects.filter(author_id__in=popular), 'id'))
+
+    pages = []
+    for queryset, id_field in sources:
+        if key is not None:
+            queryset = after_key(queryset, id_field, key, reverse)
+        ordering = ('pub_date', id_field)
+        if not reverse:
+            ordering = tuple(f'-{field}' for field in ordering)
+        pages.append(
+            queryset.order_by(*ordering).values_list(
+                'pub_date', id_field
+            )[:limit]
+        )
+
+    keys = []
+    # автор мог стать популярным, когда его рецепты уже лежали в ленте
+    for item in merge(*pages, reverse=not reverse):
+        if not keys or keys[-1] != item:
+            keys.append(item)
+            if len(keys) == limit:
+                break
+    return keys
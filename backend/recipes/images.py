@@ -0,0 +1,105 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+from recipes.versions import bump_table_version
+
+logger = logging.getLogger(__name__)
+
+# (название варианта, наибольшая сторона в пикселях)
+IMAGE_VARIANTS = (
+    ('thumbnail', 320),
+    ('card', 640),
+    ('full', 1600),
+)
+IMAGE_FORMATS = (
+    ('jpeg', 'JPEG', 'jpg'),
+    ('webp', 'WEBP', 'webp'),
+)
+IMAGE_QUALITY = 82
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='recipe-images'
+)
+
+
+def is_processed(recipe):
+    """Картинка рецепта уже заменена на обработанный вариант full."""
+    full = recipe.image_variants.get('full', {})
+    return bool(recipe.image) and recipe.image.name == full.get('jpeg')
+
+
+def schedule_image_processing(recipe):
+    """Ставит обработку картинки в пул после коммита транзакции."""
+    name = recipe.image.name
+    transaction.on_commit(
+        lambda: _executor.submit(process_recipe_image, recipe.pk, name)
+    )
+
+
+def _open_normalized(name):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        # поворот по EXIF, после пересохранения метаданных не остаётся
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+
+def _render_variants(image, stem):
+    variants = {}
+    for label, size in IMAGE_VARIANTS:
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variant = {'width': resized.width}
+        for key, pillow_format, extension in IMAGE_FORMATS:
+            buffer = BytesIO()
+            resized.save(
+                buffer, pillow_format, quality=IMAGE_QUALITY, optimize=True
+            )
+            variant[key] = default_storage.save(
+                f'{stem}_{label}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+        variants[label] = variant
+    return variants
+
+
+def process_recipe_image(recipe_id, name):
+    """
+    Нормализует загруженную картинку и сохраняет уменьшенные варианты.
+
+    Оригинал заменяется вариантом full в JPEG и удаляется. Если пока
+    шла обработка картинку рецепта успели поменять, результат
+    выбрасывается.
+    """
+    try:
+        image = _open_normalized(name)
+        variants = _render_variants(image, posixpath.splitext(name)[0])
+        updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image=variants['full']['jpeg'], image_variants=variants
+        )
+        if updated:
+            default_storage.delete(name)
+            bump_table_version(Recipe)
+        else:
+            for variant in variants.values():
+                for key, _, _ in IMAGE_FORMATS:
+                    default_storage.delete(variant[key])
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', name)
+    finally:
+        # поток пула живёт дольше запроса, соединение закрываем сами
+        connection.close()
@@ -0,0 +1,190 @@
+import csv
+import io
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import connection, transaction
+
+from recipes.models import Ingredient, Tag
+from recipes.versions import bump_table_version
+
+BATCH_SIZE = 5000
+
+
+def batches(rows, batch_size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates(model, field_name):
+    """Даты из объектов вместо auto_now_add, который всем ставит одну."""
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def read_csv(path):
+    """Построчно читает CSV без заголовка."""
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if row:
+                yield row
+
+
+def read_json(path, chunk_size=64 * 1024):
+    """
+    Построчно читает JSON-массив объектов.
+
+    Файл читается кусками, целиком в память не загружается.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as file:
+        buffer = ''
+        opened = False
+        while True:
+            chunk = file.read(chunk_size)
+            buffer += chunk
+            while True:
+                buffer = buffer.lstrip()
+                if not opened:
+                    if not buffer:
+                        break
+                    if buffer[0] != '[':
+                        raise ValueError('Ожидался JSON-массив.')
+                    buffer = buffer[1:]
+                    opened = True
+                    continue
+                buffer = buffer.lstrip(',').lstrip()
+                if not buffer or buffer[0] == ']':
+                    break
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except ValueError:
+                    # объект оборвался на границе куска
+                    if not chunk:
+                        raise
+                    break
+                buffer = buffer[end:]
+                yield item
+            if not chunk:
+                return
+
+
+def read_ingredients(path):
+    """Пары (name, measurement_unit) из CSV или JSON файла."""
+    if str(path).endswith('.json'):
+        for item in read_json(path):
+            yield item['name'], item['measurement_unit']
+    else:
+        for name, measurement_unit in read_csv(path):
+            yield name, measurement_unit
+
+
+def read_tags(path):
+    """Тройки (name, color, slug) из CSV или JSON файла."""
+    if str(path).endswith('.json'):
+        for item in read_json(path):
+            yield item['name'], item['color'], item['slug']
+    else:
+        for name, color, slug in read_csv(path):
+            yield name, color, slug
+
+
+def _copy_ingredients(rows, batch_size):
+    """PostgreSQL: COPY во временную таблицу и один INSERT ... SELECT."""
+    table = Ingredient._meta.db_table
+    processed = 0
+    with connection.cursor() as cursor:
+        # внутри внешней транзакции таблица доживает до её коммита:
+        # при повторном вызове берём её же, пустой
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS tmp_ingredient '
+            '(name varchar(200), measurement_unit varchar(200)) '
+            'ON COMMIT DROP'
+        )
+        cursor.execute('TRUNCATE tmp_ingredient')
+        for batch in batches(rows, batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(
+                'COPY tmp_ingredient (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+            processed += len(batch)
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT DISTINCT name, measurement_unit FROM tmp_ingredient '
+            'ON CONFLICT (name, measurement_unit) DO NOTHING'
+        )
+    return processed
+
+
+def _bulk_create_ingredients(rows, batch_size):
+    processed = 0
+    for batch in batches(rows, batch_size):
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in batch
+            ),
+            ignore_conflicts=True,
+        )
+        processed += len(batch)
+    return processed
+
+
+def load_ingredients(rows, batch_size=BATCH_SIZE):
+    """
+    Добавляет ингредиенты пачками, существующие пропускает.
+
+    Ключ - (name, measurement_unit), повторный запуск ничего не меняет.
+    Возвращает (обработано строк, добавлено ингредиентов).
+    """
+    with transaction.atomic():
+        before = Ingredient.objects.count()
+        if connection.vendor == 'postgresql':
+            processed = _copy_ingredients(rows, batch_size)
+        else:
+            processed = _bulk_create_ingredients(rows, batch_size)
+        created = Ingredient.objects.count() - before
+    # bulk-операции не шлют сигналы, версию таблицы меняем сами
+    bump_table_version(Ingredient)
+    return processed, created
+
+
+def load_tags(rows):
+    """
+    Добавляет новые теги и обновляет название и цвет существующих.
+
+    Ключ - slug. Возвращает (обработано строк, добавлено тегов).
+    """
+    rows = {slug: (name, color) for name, color, slug in rows}
+    with transaction.atomic():
+        existing = {
+            tag.slug: tag for tag in Tag.objects.filter(slug__in=rows)
+        }
+        changed = []
+        for slug, (name, color) in rows.items():
+            tag = existing.get(slug)
+            if tag and (tag.name, tag.color) != (name, color):
+                tag.name, tag.color = name, color
+                changed.append(tag)
+        Tag.objects.bulk_update(changed, ('name', 'color'))
+        Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for slug, (name, color) in rows.items()
+            if slug not in existing
+        )
+        bump_table_version(Tag)
+    return len(rows), len(rows) - len(existing)
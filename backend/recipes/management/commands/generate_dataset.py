@@ -0,0 +1,266 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.counters import recount_all
+from recipes.feed import all_followers, refresh_timelines
+from recipes.loaders import (
+    BATCH_SIZE,
+    batches,
+    explicit_dates,
+    load_ingredients,
+    load_tags,
+    read_ingredients,
+    read_tags,
+)
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCart,
+    Tag,
+)
+from recipes.ranking import recompute_rankings
+from recipes.search import refresh_recipe_search
+from recipes.shopping_list import all_clients, refresh_shopping_lists
+from recipes.signals import VERSIONED_MODELS
+from recipes.versions import bump_table_version
+from users.models import Subscription, User
+
+DATA_DIR = settings.BASE_DIR.parent / 'data'
+PASSWORD = 'foodgram-benchmark'
+# За сколько секунд до генерации разбросаны добавления в избранное и корзины
+RELATIONS_PERIOD = 30 * 24 * 3600
+
+
+class PowerLaw:
+    """
+    Выбор из списка с весом 1 / rank ** exponent.
+
+    Первые элементы выпадают гораздо чаще остальных: так
+    распределены популярность рецептов и авторов.
+    """
+
+    def __init__(self, items, exponent, rng):
+        self.items = items
+        self.rng = rng
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(items) + 1)
+        ))
+
+    def sample(self, count):
+        """До count разных элементов."""
+        count = min(count, len(self.items))
+        chosen = set()
+        # повторы отбрасываются, попыток с запасом
+        for _ in range(count * 4):
+            chosen.update(self.rng.choices(
+                self.items, cum_weights=self.cum_weights, k=count
+            ))
+            if len(chosen) >= count:
+                break
+        return list(chosen)[:count]
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, рецепты, избранное, '
+        'списки покупок и подписки для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Среднее число избранных рецептов у пользователя.',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=5,
+            help='Среднее число рецептов в списке покупок.',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Среднее число подписок у пользователя.',
+        )
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.1,
+            help='Показатель степенного закона популярности.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.exponent = options['exponent']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            ingredient_ids, tag_ids = self.catalogue()
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                options['recipes'], user_ids, ingredient_ids, tag_ids
+            )
+            self.create_relations(
+                Favorite, 'follower_id', 'recipe_id',
+                user_ids, recipe_ids, options['favorites'],
+            )
+            self.create_relations(
+                ShoppingCart, 'client_id', 'recipe_id',
+                user_ids, recipe_ids, options['carts'],
+            )
+            self.create_relations(
+                Subscription, 'follower_id', 'author_id',
+                user_ids, user_ids, options['subscriptions'],
+            )
+            # bulk_create не шлёт сигналы: счётчики, поиск, списки
+            # покупок, ленты и версии таблиц обновляем сами
+            recount_all()
+            refresh_recipe_search(recipe_ids)
+            for client_ids in batches(all_clients(), self.batch_size):
+                refresh_shopping_lists(client_ids)
+            for follower_ids in batches(all_followers(), self.batch_size):
+                refresh_timelines(follower_ids)
+            recompute_rankings()
+            for model in VERSIONED_MODELS + (User,):
+                bump_table_version(model)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с. '
+            f'Пароль пользователей: {PASSWORD}'
+        ))
+
+    def catalogue(self):
+        """Id ингредиентов и тегов; пустые справочники загружает."""
+        if not Ingredient.objects.exists():
+            load_ingredients(read_ingredients(DATA_DIR / 'ingredients.csv'))
+        if not Tag.objects.exists():
+            load_tags(read_tags(DATA_DIR / 'tags.json'))
+        return (
+            list(Ingredient.objects.values_list('id', flat=True)),
+            list(Tag.objects.values_list('id', flat=True)),
+        )
+
+    def bulk_create(self, model, objects):
+        """Пишет пачками, возвращает id новых строк по порядку."""
+        # SQLite не возвращает id из bulk_create, берём всё, что новее
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        for batch in batches(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+        return list(
+            model.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def create_users(self, count):
+        first = User.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        # хэш пароля считается долго, у всех он один
+        password = make_password(PASSWORD)
+        user_ids = self.bulk_create(User, (
+            User(
+                email=f'user{number}@foodgram.test',
+                username=f'user{number}',
+                first_name='Тест',
+                last_name=f'Пользователь {number}',
+                password=password,
+            )
+            for number in range(first + 1, first + count + 1)
+        ))
+        self.stdout.write(f'Пользователей: {len(user_ids)}')
+        return user_ids
+
+    def create_recipes(self, count, user_ids, ingredient_ids, tag_ids):
+        authors = PowerLaw(user_ids, self.exponent, self.rng)
+        start = timezone.now() - timedelta(minutes=count)
+        with explicit_dates(Recipe, 'pub_date'):
+            recipe_ids = self.bulk_create(Recipe, (
+                Recipe(
+                    author_id=authors.sample(1)[0],
+                    name=f'Рецепт {number}',
+                    text='Смешать и приготовить.',
+                    cooking_time=self.rng.randint(5, 180),
+                    pub_date=start + timedelta(minutes=number),
+                )
+                for number in range(count)
+            ))
+
+        # самые ходовые ингредиенты встречаются в рецептах чаще прочих
+        ingredients = PowerLaw(ingredient_ids, self.exponent, self.rng)
+        for batch in batches(recipe_ids, self.batch_size):
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500),
+                )
+                for recipe_id in batch
+                for ingredient_id in ingredients.sample(
+                    self.rng.randint(3, 12)
+                )
+            )
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in batch
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(1, min(3, len(tag_ids)))
+                )
+            )
+        self.stdout.write(f'Рецептов: {len(recipe_ids)}')
+        return recipe_ids
+
+    def create_relations(
+        self, model, user_field, target_field, user_ids, target_ids, mean
+    ):
+        """
+        Связи пользователей с рецептами или авторами.
+
+        Сколько связей у пользователя и кого выбирают - тоже по
+        степенному закону: немного активных и много случайных.
+        """
+        targets = PowerLaw(target_ids, self.exponent, self.rng)
+        now = timezone.now()
+        total = 0
+        for batch in batches(user_ids, self.batch_size):
+            objects = []
+            for user_id in batch:
+                # у Парето с alpha=2 среднее равно 2
+                count = int(self.rng.paretovariate(2) * mean / 2)
+                chosen = set(targets.sample(count))
+                if model is Subscription:
+                    chosen.discard(user_id)
+                objects += [
+                    model(**{user_field: user_id, target_field: target_id})
+                    for target_id in chosen
+                ]
+            if model is Subscription:
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+            else:
+                # добавления за последний месяц: по ним считаются рейтинги
+                for obj in objects:
+                    obj.created = now - timedelta(
+                        seconds=self.rng.uniform(0, RELATIONS_PERIOD)
+                    )
+                with explicit_dates(model, 'created'):
+                    model.objects.bulk_create(objects, ignore_conflicts=True)
+            total += len(objects)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {total}')
@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.loaders import (
+    BATCH_SIZE,
+    load_ingredients,
+    load_tags,
+    read_ingredients,
+    read_tags,
+)
+
+DATA_DIR = settings.BASE_DIR.parent / 'data'
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает справочники ингредиентов и тегов из CSV или JSON. '
+        'Существующие записи не дублируются, команду можно запускать '
+        'при каждом деплое.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=DATA_DIR / 'ingredients.csv',
+            help='Файл ингредиентов: CSV "name,unit" или JSON-массив.',
+        )
+        parser.add_argument(
+            '--tags',
+            default=DATA_DIR / 'tags.json',
+            help='Файл тегов: CSV "name,color,slug" или JSON-массив.',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed, created = load_ingredients(
+            read_ingredients(options['ingredients']),
+            batch_size=options['batch_size'],
+        )
+        self.report('Ингредиенты', processed, created, started)
+
+        started = time.perf_counter()
+        processed, created = load_tags(read_tags(options['tags']))
+        self.report('Теги', processed, created, started)
+
+    def report(self, title, processed, created, started):
+        elapsed = time.perf_counter() - started
+        rate = processed / max(elapsed, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: обработано {processed}, добавлено {created} '
+            f'за {elapsed:.2f} с ({rate:.0f} строк/с)'
+        ))
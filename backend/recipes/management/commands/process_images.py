@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import is_processed, process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт уменьшенные копии картинок рецептов, '
+        'загруженных до появления обработки.'
+    )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        processed = 0
+        for recipe in recipes.only('id', 'image', 'image_variants'):
+            if not is_processed(recipe):
+                process_recipe_image(recipe.pk, recipe.image.name)
+                processed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано картинок: {processed}')
+        )
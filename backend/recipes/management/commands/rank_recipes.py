@@ -0,0 +1,64 @@
+import time
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.blocking import BlockingScheduler
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from recipes.ranking import CHUNK_SIZE, recompute_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинги рецептов (?ordering=popular и '
+        '/api/recipes/trending/) по затухающим добавлениям в избранное '
+        'и в корзины. С --interval работает как планировщик: '
+        'пересчитывает каждые N секунд, пока его не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Пауза между пересчётами в секундах, 0 - один раз.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['interval']:
+            self.recompute(options['chunk_size'])
+            return
+        # один поток - одно соединение с БД; пересчёт, не успевший
+        # закончиться к следующему запуску, второй раз не стартует
+        scheduler = BlockingScheduler(
+            executors={'default': ThreadPoolExecutor(1)},
+            job_defaults={'coalesce': True, 'max_instances': 1},
+            timezone=settings.TIME_ZONE,
+        )
+        scheduler.add_job(
+            self.recompute,
+            'interval',
+            args=(options['chunk_size'],),
+            seconds=options['interval'],
+            next_run_time=timezone.now(),
+        )
+        try:
+            scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+
+    def recompute(self, chunk_size):
+        # между пересчётами соединение могла закрыть сама БД
+        close_old_connections()
+        try:
+            started = time.perf_counter()
+            counted, ranked = recompute_rankings(chunk_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'Учтено связей: {counted}, рецептов в рейтингах: '
+                f'{ranked}, за {time.perf_counter() - started:.1f} с.'
+            ))
+        finally:
+            close_old_connections()
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.feed import all_followers, refresh_timelines
+from recipes.loaders import batches
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет ленты подписок с подписками и рецептами и переписывает '
+        'расходящиеся строки. Нужна после recount_counters: у авторов '
+        'мог смениться признак популярности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить: ничего не менять, при расхождении - ошибка.',
+        )
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        changed = 0
+        with transaction.atomic():
+            for follower_ids in batches(
+                all_followers(), options['batch_size']
+            ):
+                changed += refresh_timelines(follower_ids)
+            if options['check']:
+                transaction.set_rollback(True)
+
+        if options['check'] and changed:
+            raise CommandError(f'Расходятся строк лент: {changed}.')
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS('Ленты сходятся.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Ленты пересобраны, исправлено строк: {changed}.'
+            ))
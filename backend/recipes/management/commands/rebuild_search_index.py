@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import refresh_recipe_search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс рецептов целиком.'
+
+    def handle(self, *args, **options):
+        refresh_recipe_search()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска пересобран.'))
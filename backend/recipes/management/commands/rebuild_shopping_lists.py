@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.loaders import batches
+from recipes.shopping_list import all_clients, refresh_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет агрегат списков покупок с корзинами и ингредиентами '
+        'рецептов и переписывает расходящиеся строки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить: ничего не менять, при расхождении - ошибка.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = 0
+        # транзакция на пачку: блокировки списков не держатся до конца
+        # всего прохода
+        for client_ids in batches(all_clients(), options['batch_size']):
+            with transaction.atomic():
+                changed += refresh_shopping_lists(client_ids)
+                if options['check']:
+                    transaction.set_rollback(True)
+
+        if options['check'] and changed:
+            raise CommandError(f'Расходятся строк агрегата: {changed}.')
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS('Агрегат сходится.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Списки покупок пересобраны, исправлено строк: {changed}.'
+            ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного, списков покупок, рецептов '
+        'и подписчиков по таблицам связей.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount_all()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
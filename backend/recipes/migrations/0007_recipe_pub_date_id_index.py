@@ -0,0 +1,57 @@
+# Generated by Django 3.2.19 on 2026-10-18 16:41
+
+import django.core.validators
+from django.db import migrations, models
+
+import recipes.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_alter_recipetag_options'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ingredient',
+            options={
+                'ordering': ['name'],
+                'verbose_name': 'Ингредиент',
+                'verbose_name_plural': 'Ингредиенты',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={
+                'ordering': ('-pub_date', '-id'),
+                'verbose_name': 'Рецепт',
+                'verbose_name_plural': 'Рецепты',
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='cooking_time',
+            field=models.IntegerField(
+                help_text='Required. 10 characters or fewer.',
+                validators=[
+                    recipes.validators.validate_cooking_time,
+                    django.core.validators.validate_integer,
+                ],
+                verbose_name='Время приготовления',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(
+                auto_now_add=True, verbose_name='Дата публикации'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['pub_date', 'id'], name='recipe_pub_date_id_idx'
+            ),
+        ),
+    ]
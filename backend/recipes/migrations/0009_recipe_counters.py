@@ -0,0 +1,60 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+
+    def count(relation_model, link):
+        return Coalesce(
+            Subquery(
+                relation_model.objects.filter(**{link: OuterRef('pk')})
+                .order_by()
+                .values(link)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            0,
+        )
+
+    Recipe.objects.update(
+        favorites_count=count(Favorite, 'recipe'),
+        in_carts_count=count(ShoppingCart, 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=count(Recipe, 'author'),
+        followers_count=count(Subscription, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+        ('recipes', '0008_ingredient_unique_name_measurement_unit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name='В избранном'
+            ),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name='В списках покупок'
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
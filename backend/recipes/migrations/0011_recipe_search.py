@@ -0,0 +1,67 @@
+# Generated by Django 3.2.19 on 2026-10-18 18:40
+
+from django.db import migrations
+
+# Копия SQL из recipes.search на момент миграции: код приложения
+# может измениться, а миграция должна давать ту же схему
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_FILL = (
+    'UPDATE recipes_recipe r SET search_vector = '
+    "setweight(to_tsvector('russian', r.name), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(("
+    "SELECT string_agg(i.name, ' ') FROM recipes_recipeingredient ri "
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    "WHERE ri.recipe_id = r.id), '')), 'B') || "
+    "setweight(to_tsvector('russian', r.text), 'C')"
+)
+
+SQLITE_FILL = (
+    f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+    'SELECT r.id, r.name, coalesce(('
+    "SELECT group_concat(i.name, ' ') FROM recipes_recipeingredient ri "
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    "WHERE ri.recipe_id = r.id), ''), r.text "
+    'FROM recipes_recipe r'
+)
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(POSTGRESQL_FILL)
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            'name, ingredients, text, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(SQLITE_FILL)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
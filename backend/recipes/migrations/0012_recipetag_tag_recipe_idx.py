@@ -0,0 +1,19 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(
+                fields=['tag', 'recipe'], name='recipetag_tag_recipe_idx'
+            ),
+        ),
+    ]
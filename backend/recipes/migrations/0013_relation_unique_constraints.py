@@ -0,0 +1,77 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+
+def _duplicates(model, fields, **aggregates):
+    """Группы повторяющихся пар с id записи, которая останется."""
+    return (
+        model.objects.values(*fields)
+        .annotate(keep_id=Min('id'), total=Count('id'), **aggregates)
+        .filter(total__gt=1)
+        .order_by()
+    )
+
+
+def remove_duplicates(apps, schema_editor):
+    """Оставляет по одной записи на пару и поправляет счётчик корзин."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    RecipeTag = apps.get_model('recipes', 'RecipeTag')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+
+    # один ингредиент дважды в рецепте - складываем количество
+    for group in _duplicates(
+        RecipeIngredient, ('recipe', 'ingredient'), amount=Sum('amount')
+    ):
+        RecipeIngredient.objects.filter(pk=group['keep_id']).update(
+            amount=group['amount']
+        )
+        RecipeIngredient.objects.filter(
+            recipe=group['recipe'], ingredient=group['ingredient']
+        ).exclude(pk=group['keep_id']).delete()
+
+    for group in _duplicates(RecipeTag, ('recipe', 'tag')):
+        RecipeTag.objects.filter(
+            recipe=group['recipe'], tag=group['tag']
+        ).exclude(pk=group['keep_id']).delete()
+
+    for group in _duplicates(ShoppingCart, ('client', 'recipe')):
+        ShoppingCart.objects.filter(
+            client=group['client'], recipe=group['recipe']
+        ).exclude(pk=group['keep_id']).delete()
+        Recipe.objects.filter(pk=group['recipe']).update(
+            in_carts_count=F('in_carts_count') - (group['total'] - 1)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipetag_tag_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipeingredient_recipe_ingredient',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='recipetag',
+            constraint=models.UniqueConstraint(
+                fields=('recipe', 'tag'), name='unique_recipetag_recipe_tag'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(
+                fields=('client', 'recipe'),
+                name='unique_shoppingcart_client_recipe',
+            ),
+        ),
+    ]
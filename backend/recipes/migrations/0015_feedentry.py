@@ -0,0 +1,114 @@
+# Generated by Django 3.2.19 on 2026-10-18 23:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_feeds(apps, schema_editor):
+    """Раскладывает рецепты по лентам по уже оформленным подпискам."""
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    rows = Recipe.objects.filter(
+        author__in_subscriptions__isnull=False,
+        author__followers_count__lte=settings.FEED_FANOUT_LIMIT,
+    ).values_list(
+        'author__in_subscriptions__follower_id', 'id', 'author_id', 'pub_date'
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                follower_id=follower_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for follower_id, recipe_id, author_id, pub_date in (
+                rows.order_by().iterator()
+            )
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0003_subscription_unique_follower_author'),
+        ('recipes', '0014_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'pub_date',
+                    models.DateTimeField(verbose_name='Дата публикации'),
+                ),
+                (
+                    'author',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='Автор',
+                    ),
+                ),
+                (
+                    'follower',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='feed_entries',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='Подписчик',
+                    ),
+                ),
+                (
+                    'recipe',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='feed_entries',
+                        to='recipes.recipe',
+                        verbose_name='Рецепт',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(
+                fields=['follower', 'pub_date', 'recipe'],
+                name='feedentry_follower_date_idx',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(
+                fields=('follower', 'recipe'),
+                name='unique_feedentry_follower_recipe',
+            ),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 3.2.19 on 2026-10-18 23:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_created(apps, schema_editor):
+    # когда добавлены старые связи, неизвестно; не раньше публикации
+    # рецепта - берём её, иначе все они разом попали бы в тренды.
+    # У связей без рецепта остаётся время миграции
+    Recipe = apps.get_model('recipes', 'Recipe')
+    pub_date = Subquery(
+        Recipe.objects.filter(pk=OuterRef('recipe_id')).values('pub_date')[:1]
+    )
+    for model_name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('recipes', model_name).objects.filter(
+            recipe__isnull=False
+        ).update(created=pub_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name='Добавлено',
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                default=django.utils.timezone.now,
+                verbose_name='Добавлено',
+            ),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                (
+                    'recipe',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='ranking',
+                        serialize=False,
+                        to='recipes.recipe',
+                        verbose_name='Рецепт',
+                    ),
+                ),
+                (
+                    'popular_score',
+                    models.FloatField(verbose_name='Популярность'),
+                ),
+                (
+                    'trending_score',
+                    models.FloatField(verbose_name='Тренд'),
+                ),
+                (
+                    'popular_position',
+                    models.PositiveIntegerField(
+                        db_index=True,
+                        null=True,
+                        verbose_name='Место по популярности',
+                    ),
+                ),
+                (
+                    'trending_position',
+                    models.PositiveIntegerField(
+                        db_index=True,
+                        null=True,
+                        verbose_name='Место в трендах',
+                    ),
+                ),
+                (
+                    'computed_at',
+                    models.DateTimeField(verbose_name='Пересчитано'),
+                ),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.RunPython(backfill_created, migrations.RunPython.noop),
+    ]
@@ -6,7 +6,7 @@ from django.core.validators import (
     validate_slug,
 )
 from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db.models import Exists, OuterRef, Prefetch
 
 from recipes.validators import validate_cooking_time
 from users.models import User
@@ -45,6 +45,12 @@ class Ingredient(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_measurement_unit',
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ['name']
@@ -68,6 +74,21 @@ class RecipeQuerySet(models.QuerySet):
             ),
         )
 
+    def with_related(self):
+        """Автор, теги и ингредиенты за фиксированное число запросов."""
+        return self.select_related('author').prefetch_related(
+            Prefetch(
+                'recipetag_set',
+                queryset=RecipeTag.objects.select_related('tag'),
+            ),
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+
 
 class Recipe(models.Model):
     tags = models.ManyToManyField(
@@ -91,7 +112,7 @@ class Recipe(models.Model):
         verbose_name='Ингредиенты',
     )
     pub_date = models.DateTimeField(
-        verbose_name='Дата публикации', auto_now_add=True, db_index=True
+        verbose_name='Дата публикации', auto_now_add=True
     )
     cooking_time = models.IntegerField(
         verbose_name='Время приготовления',
@@ -101,11 +122,31 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/images/', null=True, default=None
     )
+    # уменьшенные копии картинки, заполняет recipes.images
+    image_variants = models.JSONField(default=dict, editable=False)
+    # счётчики ведёт recipes.counters при записи связей
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок', default=0, editable=False
+    )
 
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        # id добавлен для устойчивого порядка при одинаковой дате
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=('pub_date', 'id'), name='recipe_pub_date_id_idx'
+            ),
+            # лента добирает рецепты популярных авторов по этому ключу
+            models.Index(
+                fields=('author', 'pub_date', 'id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -126,6 +167,12 @@ class RecipeIngredient(models.Model):
         return f'{self.ingredient} в {self.recipe}'
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipeingredient_recipe_ingredient',
+            )
+        ]
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецептах'
 
@@ -145,6 +192,10 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
         null=True,  # null нужен, чтобы не ругался при создании на отправку пустой формы
     )
+    # по времени добавления считается рейтинг, см. recipes.ranking
+    created = models.DateTimeField(
+        verbose_name='Добавлено', auto_now_add=True
+    )
 
     def __str__(self):
         return f'Избранный {self.recipe} у {self.follower}'
@@ -174,6 +225,17 @@ class RecipeTag(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'tag'), name='unique_recipetag_recipe_tag'
+            )
+        ]
+        indexes = [
+            # для EXISTS-фильтра рецептов по тегам
+            models.Index(
+                fields=('tag', 'recipe'), name='recipetag_tag_recipe_idx'
+            ),
+        ]
         verbose_name = 'Тег/Рецепт'
         verbose_name_plural = 'Теги в рецептах'
         ordering = ('-id',)
@@ -192,7 +254,136 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
         related_name='in_shopping_list',
     )
+    created = models.DateTimeField(
+        verbose_name='Добавлено', auto_now_add=True
+    )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('client', 'recipe'),
+                name='unique_shoppingcart_client_recipe',
+            )
+        ]
         verbose_name = 'Покупка'
         verbose_name_plural = 'Покупки'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Сколько ингредиента нужно купить по всем рецептам в корзине.
+
+    Агрегат поверх ShoppingCart и RecipeIngredient, его ведёт
+    recipes.shopping_list в тех же транзакциях, что меняют корзину
+    и ингредиенты рецептов.
+    """
+
+    client = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        verbose_name='Покупатель',
+        related_name='shopping_list_items',
+    )
+    ingredient = models.ForeignKey(
+        to=Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveBigIntegerField(verbose_name='Количество')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('client', 'ingredient'),
+                name='unique_shoppinglistitem_client_ingredient',
+            )
+        ]
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+
+    def __str__(self):
+        return f'{self.ingredient} для {self.client}: {self.amount}'
+
+
+class FeedEntry(models.Model):
+    """
+    Рецепт в ленте подписчика.
+
+    Ленты раскладывает recipes.feed при публикации рецепта и при
+    подписке. Рецепты популярных авторов сюда не пишутся: их лента
+    добирает при чтении.
+    """
+
+    follower = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        to=Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries',
+    )
+    # копии полей рецепта: отписка и страница ленты обходятся без JOIN
+    author = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('follower', 'recipe'),
+                name='unique_feedentry_follower_recipe',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('follower', 'pub_date', 'recipe'),
+                name='feedentry_follower_date_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return f'{self.recipe} для {self.follower}'
+
+
+class RecipeRanking(models.Model):
+    """
+    Место рецепта в рейтингах популярности.
+
+    Таблицу целиком пересчитывает recipes.ranking по затухающим во
+    времени добавлениям в избранное и в корзины. В таблице только
+    рецепты, попавшие хотя бы в один рейтинг.
+    """
+
+    recipe = models.OneToOneField(
+        to=Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='ranking',
+    )
+    popular_score = models.FloatField(verbose_name='Популярность')
+    trending_score = models.FloatField(verbose_name='Тренд')
+    popular_position = models.PositiveIntegerField(
+        verbose_name='Место по популярности', null=True, db_index=True
+    )
+    trending_position = models.PositiveIntegerField(
+        verbose_name='Место в трендах', null=True, db_index=True
+    )
+    computed_at = models.DateTimeField(verbose_name='Пересчитано')
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular_position}'
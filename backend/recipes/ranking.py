@@ -0,0 +1,177 @@
+import math
+import time
+from array import array
+from heapq import nlargest
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, RecipeRanking, ShoppingCart
+from recipes.versions import bump_table_version
+
+# Связи, добавления в которые поднимают рецепт в рейтингах
+SOURCES = (Favorite, ShoppingCart)
+CHUNK_SIZE = 100000
+
+
+def decay_rate(half_life):
+    """Скорость затухания в 1/с для периода полураспада в часах."""
+    return math.log(2) / (half_life * 3600)
+
+
+def add_decayed(scores, model, now, chunk_size):
+    """
+    Прибавляет к счетам рецептов затухающие добавления в связь.
+
+    scores - пары (array('d') счетов по id рецепта, скорость
+    затухания). Таблица читается диапазонами pk по chunk_size строк,
+    и каждый диапазон БД сама сворачивает до (рецепт, час, число):
+    в Python приходит на порядки меньше строк, чем лежит в таблице.
+    Возвращает число учтённых строк связи.
+    """
+    bounds = model.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+    size = len(scores[0][0])
+    counted = 0
+    for start in range(bounds['first'], bounds['last'] + 1, chunk_size):
+        buckets = (
+            model.objects.filter(
+                pk__gte=start,
+                pk__lt=start + chunk_size,
+                recipe_id__lt=size,
+            )
+            .values('recipe_id', hour=TruncHour('created'))
+            .annotate(total=Count('pk'))
+            .order_by()
+            .values_list('recipe_id', 'hour', 'total')
+        )
+        for recipe_id, hour, total in buckets:
+            # возраст считаем от середины часа
+            age = max(now - hour.timestamp() - 1800, 0)
+            for values, rate in scores:
+                values[recipe_id] += total * math.exp(-rate * age)
+            counted += total
+    return counted
+
+
+def top(values, size):
+    """Id с положительным счётом по убыванию, при равенстве новые выше."""
+    return nlargest(
+        size,
+        (pk for pk in range(len(values)) if values[pk] > 0),
+        key=lambda pk: (values[pk], pk),
+    )
+
+
+def recompute_rankings(chunk_size=CHUNK_SIZE):
+    """
+    Пересчитывает таблицу RecipeRanking целиком.
+
+    Счета копятся в плотных массивах, индекс - id рецепта: на миллион
+    рецептов это 8 МБ на рейтинг. Рецепты, опубликованные во время
+    пересчёта, попадут в следующий. Возвращает число учтённых строк
+    связей и число рецептов в рейтингах.
+    """
+    now = time.time()
+    size = (Recipe.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    popular = array('d', bytes(8 * size))
+    trending = array('d', bytes(8 * size))
+    scores = (
+        (popular, decay_rate(settings.RANKING_POPULAR_HALF_LIFE)),
+        (trending, decay_rate(settings.RANKING_TRENDING_HALF_LIFE)),
+    )
+    counted = sum(
+        add_decayed(scores, model, now, chunk_size) for model in SOURCES
+    )
+
+    popular_positions = {
+        pk: position
+        for position, pk in enumerate(
+            top(popular, settings.RANKING_SIZE), start=1
+        )
+    }
+    trending_positions = {
+        pk: position
+        for position, pk in enumerate(
+            top(trending, settings.RANKING_SIZE), start=1
+        )
+    }
+    computed_at = timezone.now()
+    with transaction.atomic():
+        # рецепт могли удалить, пока шёл подсчёт
+        ranked = Recipe.objects.filter(
+            pk__in=popular_positions.keys() | trending_positions.keys()
+        ).values_list('pk', flat=True)
+        rankings = [
+            RecipeRanking(
+                recipe_id=pk,
+                popular_score=popular[pk],
+                trending_score=trending[pk],
+                popular_position=popular_positions.get(pk),
+                trending_position=trending_positions.get(pk),
+                computed_at=computed_at,
+            )
+            for pk in ranked
+        ]
+        # читатели до коммита видят прежний рейтинг целиком
+        RecipeRanking.objects.all().delete()
+        RecipeRanking.objects.bulk_create(rankings, batch_size=5000)
+    bump_table_version(RecipeRanking)
+    return counted, len(rankings)
+
+
+class PopularIds:
+    """
+    Id рецептов по популярности - последовательность для пагинатора.
+
+    Рецепты с местом идут по индексу popular_position, как в
+    trending_ids(), без JOIN и сортировки всей таблицы. За ними -
+    хвост без места (вне RANKING_SIZE или без добавлений), новые
+    сверху, по индексу даты.
+    """
+
+    def __init__(self, recipes):
+        recipes = recipes.order_by().values('pk')
+        self.recipes = recipes
+        self.ranked = (
+            RecipeRanking.objects.filter(
+                popular_position__isnull=False, recipe__in=recipes
+            )
+            .order_by('popular_position')
+            .values_list('recipe_id', flat=True)
+        )
+        self.unranked = (
+            Recipe.objects.filter(
+                pk__in=recipes, ranking__popular_position__isnull=True
+            )
+            .order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)
+        )
+
+    def count(self):
+        return self.recipes.count()
+
+    def __getitem__(self, page):
+        # пагинатор берёт только срезы [offset:offset + limit]
+        start, stop = page.start or 0, page.stop
+        ids = list(self.ranked[start:stop])
+        if len(ids) == stop - start:
+            return ids
+        # места кончились на этой странице или раньше
+        ranked = start + len(ids) if ids else self.ranked.count()
+        offset = max(start - ranked, 0)
+        ids += self.unranked[offset:offset + stop - start - len(ids)]
+        return ids
+
+
+def trending_ids():
+    """Id рецептов в трендах по местам - по индексу, без сортировки."""
+    return (
+        RecipeRanking.objects.filter(trending_position__isnull=False)
+        .order_by('trending_position')
+        .values_list('recipe_id', flat=True)
+    )
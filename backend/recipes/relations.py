@@ -0,0 +1,104 @@
+import time
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+# Связь -> (модель, поле пользователя, поле id в наборе)
+RELATIONS = {
+    'favorites': (Favorite, 'follower_id', 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'client_id', 'recipe_id'),
+    'subscriptions': (Subscription, 'follower_id', 'author_id'),
+}
+RELATIONS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class IdSet:
+    """Отсортированный массив id, вхождение проверяется бинарным поиском."""
+
+    __slots__ = ('_ids',)
+
+    def __init__(self, ids=None):
+        self._ids = ids if ids is not None else array('q')
+
+    def __contains__(self, value):
+        index = bisect_left(self._ids, value)
+        return index < len(self._ids) and self._ids[index] == value
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __repr__(self):
+        return f'IdSet({list(self._ids)})'
+
+
+def _version_key(relation, user_id):
+    return f'relations:{relation}:{user_id}:version'
+
+
+def _new_version():
+    # не с единицы: ключ версии мог быть вытеснен из кэша,
+    # а данные под старой версией - ещё нет
+    return int(time.time() * 1000)
+
+
+def get_relation_version(relation, user_id):
+    version_key = _version_key(relation, user_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, _new_version(), None)
+        version = cache.get(version_key)
+    return version
+
+
+def get_relation_ids(relation, user_id):
+    """
+    Id рецептов (или авторов), связанных с пользователем.
+
+    Набор хранится в кэше Django как массив байт под ключом с версией,
+    при любом изменении связи версия увеличивается.
+    """
+    if user_id is None:
+        return IdSet()
+    version = get_relation_version(relation, user_id)
+    data_key = f'relations:{relation}:{user_id}:{version}'
+
+    data = cache.get(data_key)
+    ids = array('q')
+    if data is not None:
+        ids.frombytes(data)
+        return IdSet(ids)
+
+    model, user_field, id_field = RELATIONS[relation]
+    # с основной базы: набор с отстающей реплики лёг бы в кэш под
+    # новой версией
+    ids.extend(
+        model.objects.using('default')
+        .filter(**{user_field: user_id})
+        .order_by(id_field)
+        .values_list(id_field, flat=True)
+        .distinct()
+    )
+    cache.set(data_key, ids.tobytes(), RELATIONS_CACHE_TIMEOUT)
+    return IdSet(ids)
+
+
+def bump_relation_version(relation, user_id):
+    """Отмечает изменение связи пользователя после коммита транзакции."""
+    version_key = _version_key(relation, user_id)
+
+    def bump():
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, _new_version(), None)
+
+    # до коммита чтение закэшировало бы прежний набор под новой версией
+    transaction.on_commit(bump)
@@ -0,0 +1,181 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Ingredient
+from recipes.versions import get_table_versions
+
+
+class IngredientPrefixIndex:
+    """
+    Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированный массив названий в нижнем регистре и ищет
+    по префиксу бинарным поиском, без запросов в БД. Индекс привязан
+    к версии таблицы ингредиентов и перестраивается при следующем
+    поиске после любого её изменения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (версия, ключи, строки) подменяются одним присваиванием
+        self._data = (None, [], [])
+
+    def _build(self, version):
+        # с основной базы: с отстающей реплики индекс остался бы
+        # устаревшим под новой версией до следующего изменения
+        rows = sorted(
+            Ingredient.objects.using('default')
+            .order_by()
+            .values('id', 'name', 'measurement_unit'),
+            key=lambda row: (row['name'].casefold(), row['id']),
+        )
+        keys = [row['name'].casefold() for row in rows]
+        self._data = (version, keys, rows)
+
+    def _snapshot(self):
+        (version,) = get_table_versions((Ingredient,))
+        if self._data[0] != version:
+            with self._lock:
+                if self._data[0] != version:
+                    self._build(version)
+        return self._data[1], self._data[2]
+
+    def search(self, prefix, limit):
+        """
+        Ингредиенты, чьё название начинается с prefix (без учёта регистра).
+
+        Сначала точное совпадение, затем более короткие названия,
+        затем по алфавиту; не больше limit строк.
+        Пустой prefix возвращает весь справочник.
+        """
+        keys, rows = self._snapshot()
+        prefix = prefix.casefold()
+        if not prefix:
+            return list(rows)
+        start = bisect_left(keys, prefix)
+        stop = bisect_right(keys, prefix + '\U0010ffff', lo=start)
+        best = heapq.nsmallest(
+            limit,
+            range(start, stop),
+            key=lambda i: (keys[i] != prefix, len(keys[i]), i),
+        )
+        return [rows[i] for i in best]
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+# Полнотекстовый поиск рецептов. Индекс живёт вне модели: на PostgreSQL
+# это колонка tsvector с GIN-индексом, на SQLite - таблица FTS5.
+# Создаются миграцией 0011_recipe_search.
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+
+_INGREDIENT_NAMES_SQL = (
+    'SELECT {aggregate} FROM recipes_recipeingredient ri '
+    'JOIN recipes_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = r.id'
+)
+
+
+def _postgresql_refresh(cursor, where, params):
+    names = _INGREDIENT_NAMES_SQL.format(aggregate="string_agg(i.name, ' ')")
+    cursor.execute(
+        'UPDATE recipes_recipe r SET search_vector = '
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', r.name), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+        f"coalesce(({names}), '')), 'B') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', r.text), 'C')"
+        f'{where}',
+        params,
+    )
+
+
+def _sqlite_refresh(cursor, where, params):
+    names = _INGREDIENT_NAMES_SQL.format(aggregate="group_concat(i.name, ' ')")
+    cursor.execute(
+        f'DELETE FROM {FTS_TABLE}{where.replace("r.id", "rowid")}', params
+    )
+    cursor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+        f"SELECT r.id, r.name, coalesce(({names}), ''), r.text "
+        f'FROM recipes_recipe r{where}',
+        params,
+    )
+
+
+def refresh_recipe_search(recipe_ids=None, using=None):
+    """
+    Пересобирает поисковые документы рецептов.
+
+    recipe_ids=None - все рецепты. Удалённые рецепты из индекса
+    пропадают, поэтому функцию можно звать и после удаления.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if recipe_ids is None:
+        where, params = '', ()
+    else:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        where = f' WHERE r.id IN ({placeholders})'
+        params = recipe_ids
+    refresh = {
+        'postgresql': _postgresql_refresh,
+        'sqlite': _sqlite_refresh,
+    }.get(connection.vendor)
+    if refresh is not None:
+        with connection.cursor() as cursor:
+            refresh(cursor, where, params)
+
+
+def _fts5_query(query):
+    """Слова запроса как префиксы в кавычках: без синтаксиса FTS5."""
+    words = re.findall(r'\w+', query)
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+
+def search_recipes(queryset, query):
+    """Рецепты по запросу, самые релевантные первыми."""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        matches = RawSQL(
+            f'SELECT id FROM recipes_recipe WHERE search_vector @@ {tsquery}',
+            (query,),
+        )
+        rank = RawSQL(
+            f'ts_rank(recipes_recipe.search_vector, {tsquery})', (query,)
+        )
+    elif vendor == 'sqlite':
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return queryset.none()
+        matches = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (fts_query,),
+        )
+        # bm25 тем меньше, чем документ релевантнее; веса как у setweight
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 4.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id',
+            (fts_query,),
+        )
+    else:
+        return queryset.filter(
+            Q(name__icontains=query)
+            | Q(text__icontains=query)
+            | Q(ingredients__name__icontains=query)
+        ).distinct()
+    return (
+        queryset.filter(id__in=matches)
+        .annotate(search_rank=rank)
+        .order_by('-search_rank', '-pub_date', '-id')
+    )
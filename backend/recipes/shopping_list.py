@@ -0,0 +1,111 @@
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+from users.models import User
+
+
+def recipe_ingredient_ids(recipe_ids):
+    """Id ингредиентов рецептов - подзапросом, без отдельного похода."""
+    return RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).values(
+        'ingredient_id'
+    )
+
+
+def recipe_clients(recipe_ids):
+    """Id покупателей, у которых рецепты лежат в корзине."""
+    return ShoppingCart.objects.filter(recipe_id__in=recipe_ids).values(
+        'client_id'
+    )
+
+
+def _lock_shopping_lists(client_ids):
+    """
+    Блокирует списки покупателей до конца транзакции.
+
+    Рекомендательная блокировка PostgreSQL по id покупателя: строки
+    пользователей не трогаются, вход и правка профиля не ждут. Id
+    берутся по возрастанию, чтобы транзакции не ждали друг друга по
+    кругу. SQLite и так пишет одной транзакцией за раз.
+    """
+    if connection.vendor != 'postgresql' or not client_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(hashtext(%s), id) '
+            'FROM (SELECT unnest(%s::integer[]) AS id ORDER BY id) AS ids',
+            [ShoppingListItem._meta.db_table, client_ids],
+        )
+
+
+def refresh_shopping_lists(client_ids, ingredient_ids=None):
+    """
+    Пересчитывает агрегат списков покупок по корзинам.
+
+    Считаются заново только пары (покупатель, ингредиент) из
+    аргументов, ingredient_ids=None - весь список покупателя.
+    В БД пишется разница: новые, изменённые и лишние строки.
+    Возвращает число записанных строк.
+    """
+    # точка сохранения не нужна: ошибка откатывает всю транзакцию
+    with transaction.atomic(savepoint=False):
+        client_ids = list(
+            User.objects.filter(pk__in=client_ids)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        if not client_ids:
+            return 0
+        # список покупателя пересчитывает одна транзакция за раз,
+        # иначе параллельные вставки упрутся в уникальный индекс
+        _lock_shopping_lists(client_ids)
+        items = ShoppingListItem.objects.filter(client_id__in=client_ids)
+        sources = RecipeIngredient.objects.filter(
+            recipe__in_shopping_list__client_id__in=client_ids
+        )
+        if ingredient_ids is not None:
+            items = items.filter(ingredient_id__in=ingredient_ids)
+            sources = sources.filter(ingredient_id__in=ingredient_ids)
+
+        totals = {
+            (client_id, ingredient_id): total
+            for client_id, ingredient_id, total in sources.values(
+                'recipe__in_shopping_list__client_id', 'ingredient_id'
+            )
+            .annotate(total=Sum('amount'))
+            .order_by()
+            .values_list(
+                'recipe__in_shopping_list__client_id',
+                'ingredient_id',
+                'total',
+            )
+        }
+        stale = []
+        changed = []
+        for item in items:
+            total = totals.pop((item.client_id, item.ingredient_id), None)
+            if total is None:
+                stale.append(item.pk)
+            elif total != item.amount:
+                item.amount = total
+                changed.append(item)
+
+        if stale:
+            ShoppingListItem.objects.filter(pk__in=stale).delete()
+        if changed:
+            ShoppingListItem.objects.bulk_update(changed, ('amount',))
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                client_id=client_id, ingredient_id=ingredient_id, amount=total
+            )
+            for (client_id, ingredient_id), total in totals.items()
+        )
+    return len(stale) + len(changed) + len(totals)
+
+
+def all_clients():
+    """Id всех, у кого есть корзина или строки агрегата, по порядку."""
+    return sorted(
+        set(ShoppingCart.objects.values_list('client_id', flat=True))
+        | set(ShoppingListItem.objects.values_list('client_id', flat=True))
+    )
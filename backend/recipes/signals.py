@@ -0,0 +1,151 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.counters import COUNTERS, shift_counters
+from recipes.feed import fan_out, refresh_subscription, refresh_timelines
+from recipes.images import is_processed, schedule_image_processing
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCart,
+    Tag,
+)
+from recipes.relations import bump_relation_version
+from recipes.search import refresh_recipe_search
+from recipes.shopping_list import (
+    recipe_clients,
+    recipe_ingredient_ids,
+    refresh_shopping_lists,
+)
+from recipes.versions import bump_table_version
+from users.models import Subscription, User
+
+# Таблицы, из которых собираются кэшируемые ответы API
+VERSIONED_MODELS = (Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_versioned_table(sender, **kwargs):
+    if sender in VERSIONED_MODELS:
+        bump_table_version(sender)
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(instance, **kwargs):
+    # и для API, и для админки: новая картинка ещё не обработана
+    if instance.image and not is_processed(instance):
+        schedule_image_processing(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def refresh_search_for_recipe(instance, **kwargs):
+    refresh_recipe_search([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_search_for_ingredients(instance, **kwargs):
+    refresh_recipe_search([instance.recipe_id])
+
+
+@receiver(post_save)
+def increment_counters(sender, instance, created, **kwargs):
+    if created and sender in COUNTERS:
+        shift_counters(instance, 1)
+
+
+@receiver(post_delete)
+def decrement_counters(sender, instance, **kwargs):
+    if sender in COUNTERS:
+        shift_counters(instance, -1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_users_table(update_fields=None, **kwargs):
+    # вход в систему обновляет только last_login, на ответы API не влияет
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_table_version(User)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorites(instance, **kwargs):
+    bump_relation_version('favorites', instance.follower_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_shopping_cart(instance, **kwargs):
+    bump_relation_version('shopping_cart', instance.client_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def refresh_shopping_list_for_cart(instance, created=True, **kwargs):
+    # правка готовой строки корзины могла сменить рецепт
+    ingredient_ids = None
+    if created:
+        ingredient_ids = recipe_ingredient_ids([instance.recipe_id])
+    refresh_shopping_lists([instance.client_id], ingredient_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_shopping_lists_for_ingredient(instance, created=True, **kwargs):
+    # при правке строки мог смениться сам ингредиент
+    ingredient_ids = [instance.ingredient_id] if created else None
+    refresh_shopping_lists(
+        recipe_clients([instance.recipe_id]), ingredient_ids
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_shopping_lists(instance, **kwargs):
+    # к post_delete рецепта корзины и его ингредиенты уже удалены
+    instance._shopping_lists = (
+        list(recipe_clients([instance.pk]).values_list(
+            'client_id', flat=True
+        )),
+        list(recipe_ingredient_ids([instance.pk]).values_list(
+            'ingredient_id', flat=True
+        )),
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def refresh_shopping_lists_for_recipe(instance, **kwargs):
+    client_ids, ingredient_ids = getattr(
+        instance, '_shopping_lists', ((), ())
+    )
+    if client_ids:
+        refresh_shopping_lists(client_ids, ingredient_ids)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscriptions(instance, **kwargs):
+    bump_relation_version('subscriptions', instance.follower_id)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(instance, created, **kwargs):
+    if created:
+        fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def refresh_timeline_for_subscription(instance, created=True, **kwargs):
+    # счётчик подписчиков к этому моменту уже сдвинут increment_counters
+    if created:
+        refresh_subscription(instance.follower_id, instance.author_id)
+    else:
+        # правка готовой подписки могла сменить автора
+        refresh_timelines([instance.follower_id])
@@ -0,0 +1,38 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(model):
+    return f'table-version:{model._meta.label_lower}'
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def get_table_versions(models):
+    """
+    Версии таблиц - время последнего изменения в миллисекундах.
+
+    Если версии нет в кэше (холодный старт, вытеснение), таблица
+    считается изменённой только что.
+    """
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _now(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_table_version(model):
+    """Отмечает изменение таблицы после коммита текущей транзакции."""
+    key = _version_key(model)
+
+    def bump():
+        cache.set(key, max(_now(), (cache.get(key) or 0) + 1), None)
+
+    transaction.on_commit(bump)
@@ -9,6 +9,8 @@ class UserAdmin(admin.ModelAdmin):
         'id',
         'email',
         'username',
+        'recipes_count',
+        'followers_count',
     )
     search_fields = (
         'id',
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.19 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name='Подписчиков'
+            ),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name='Рецептов'
+            ),
+        ),
+    ]
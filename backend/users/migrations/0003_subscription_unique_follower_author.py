@@ -0,0 +1,43 @@
+# Generated by Django 3.2.19 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def remove_duplicate_subscriptions(apps, schema_editor):
+    """Оставляет одну подписку на пару, счётчик подписчиков уменьшает."""
+    Subscription = apps.get_model('users', 'Subscription')
+    User = apps.get_model('users', 'User')
+    duplicates = (
+        Subscription.objects.values('follower', 'author')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        Subscription.objects.filter(
+            follower=group['follower'], author=group['author']
+        ).exclude(pk=group['keep_id']).delete()
+        User.objects.filter(pk=group['author']).update(
+            followers_count=F('followers_count') - (group['total'] - 1)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_subscriptions, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(
+                fields=('follower', 'author'),
+                name='unique_subscription_follower_author',
+            ),
+        ),
+    ]
@@ -37,6 +37,13 @@ class User(AbstractUser):
         validators=[MaxLengthValidator(limit_value=150)],
         help_text='Required. 150 characters or fewer.',
     )
+    # счётчики ведёт recipes.counters при записи связей
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -60,5 +67,11 @@ class Subscription(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('follower', 'author'),
+                name='unique_subscription_follower_author',
+            )
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'